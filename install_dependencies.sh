@@ -12,6 +12,7 @@ pip install urllib3
 pip install pytrends
 pip install requests
 pip install googlesearch-python
+pip install orjson
 
 echo "Installation completed successfully"
 pip list
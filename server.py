@@ -1,205 +1,720 @@
 import http.server
-import socketserver
 import json
 import os
 import traceback
 import urllib.parse
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from types import MappingProxyType
 import logging
 import signal
 import time
+import hashlib
+import gzip
+import functools
+import contextlib
+import contextvars
+import itertools
+import random
+import selectors
+import socket
+import ssl
+import threading
+from collections import OrderedDict
+import certifi
 import requests
+import pandas as pd
+from googlesearch import search
+from pytrends import dailydata
+from pytrends.exceptions import ResponseError, TooManyRequestsError
+from pytrends.request import BASE_TRENDS_URL, TrendReq
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Configure logging; LOG_LEVEL=DEBUG adds tracebacks to handler errors
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class RateLimiter:
+    """Token bucket allowing max_calls per time_frame seconds, refilled continuously"""
     def __init__(self, max_calls, time_frame):
         self.max_calls = max_calls
         self.time_frame = time_frame
-        self.calls = []
+        self.rate = max_calls / time_frame
+        self.tokens = float(max_calls)
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
 
-    def add_call(self):
-        now = time.time()
-        self.calls = [call for call in self.calls if call > now - self.time_frame]
-        self.calls.append(now)
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_calls, self.tokens + (now - self.last) * self.rate)
+        self.last = now
 
     def is_allowed(self):
-        return len(self.calls) < self.max_calls
+        """Take a token if one is available; returns False when the bucket is empty"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def wait(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
 
 # Create a rate limiter: 100 calls per minute
 rate_limiter = RateLimiter(max_calls=100, time_frame=60)
 
-def get_google_suggestions(keyword, num_suggestions=10, language="en", region="us"):
-    """Get autocomplete suggestions from Google"""
+class DiskCache:
+    """JSON file cache with a TTL, a staleness grace period and stale-on-error fallback"""
+    def __init__(self, directory, grace_period):
+        self.directory = directory
+        self.grace_period = grace_period
+        self.lock = threading.Lock()
+        self.refreshing = set()
+
+    def _path(self, key):
+        digest = hashlib.sha1(json.dumps(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def read(self, key):
+        """Return (stored_at, value) for a key, or None if it is not cached"""
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            entry = orjson.loads(data) if orjson is not None else json.loads(data)
+            return entry["stored_at"], entry["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def write(self, key, value):
+        """Atomically store a value for a key"""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(encode_json({"stored_at": time.time(), "value": value}))
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write cache entry {key}: {str(e)}")
+
+    def refresh_in_background(self, key, fetch):
+        """Refresh a stale entry in a daemon thread, at most once at a time per key"""
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def refresh():
+            try:
+                self.write(key, fetch())
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {key}: {str(e)}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get_or_fetch(self, key, ttl, fetch, refresh=False):
+        """
+        Return (value, stale) for a key, calling fetch() only when needed.
+
+        Fresh entries are returned as-is. Entries within the grace period are
+        returned immediately and refreshed in the background. When fetching
+        fails with a rate-limit/unavailable error, the last stored value is
+        returned as stale instead of raising.
+        """
+        entry = self.read(key)
+        if entry is not None and not refresh:
+            age = time.time() - entry[0]
+            if age < ttl:
+                return entry[1], False
+            if age < ttl + self.grace_period:
+                self.refresh_in_background(key, fetch)
+                return entry[1], True
+
+        try:
+            value = fetch()
+        except Exception as e:
+            if entry is not None and ('429' in str(e) or '503' in str(e)):
+                logger.warning(f"Serving stale cache entry for {key}: {str(e)}")
+                return entry[1], True
+            raise
+
+        self.write(key, value)
+        return value, False
+
+# Cache trending data on disk: 1 hour for daily trending, 10 minutes for realtime
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache'))
+TRENDING_CACHE_TTL = 3600
+REALTIME_CACHE_TTL = 600
+trending_cache = DiskCache(CACHE_DIR, grace_period=3600)
+
+class MemoryCache:
+    """Bounded in-process LRU cache with a TTL, for results too short-lived to write to disk"""
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (stored_at, value, retained, size); expired entries stay until evicted so put() can compare against them
+        self.entries = OrderedDict()
+        self.lock = threading.RLock()
+
+    def get(self, key):
+        """Return the cached value, or None when it is missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value, size=None):
+        """
+        Store value for key and return whatever the cache now holds for it.
+
+        size is the number of records behind value (see record_count). When
+        given, a refetch with fewer records than the cached entry is treated
+        as degraded: pytrends intermittently returns empty or truncated data,
+        so the earlier result is kept for one more TTL before the smaller one
+        is accepted.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            now = time.monotonic()
+            if size is not None and entry is not None and not entry[2] and entry[3] is not None and size < entry[3]:
+                logger.warning(f"Keeping previous result for {key}: new one has {size} records, cached {entry[3]}")
+                self.entries[key] = (now, entry[1], True, entry[3])
+                self.entries.move_to_end(key)
+                return entry[1]
+
+            self.entries[key] = (now, value, False, size)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+            return value
+
+def record_count(data):
+    """Count the records in a response's data, summing the lists nested inside it, for MemoryCache.put's size"""
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, dict):
+        return sum(record_count(value) for value in data.values())
+    return 0
+
+class SingleFlight:
+    """Run one call per key at a time; callers arriving while it runs share its result"""
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return fn(), or wait for and return the result of the call already running for key"""
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+# Cache /trends/* results in memory for 15 minutes
+TRENDS_CACHE_TTL = 900
+trends_cache = MemoryCache(maxsize=1024, ttl=TRENDS_CACHE_TTL)
+# Identical /trends/* requests that miss the cache together share a single Google fetch
+trends_flight = SingleFlight()
+
+# The category taxonomy only varies by language and rarely changes, so keep encoded responses for a day
+CATEGORIES_CACHE_TTL = 86400
+categories_cache = MemoryCache(maxsize=64, ttl=CATEGORIES_CACHE_TTL)
+
+# Retry transient upstream failures with exponential backoff: 0.5s, 1s, 2s, 4s, 8s, 8s
+RETRY_ATTEMPTS = 7
+RETRY_INITIAL_WAIT = 0.5
+RETRY_MAX_WAIT = 8
+RETRY_AFTER_MAX_WAIT = 60
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Seconds one request may spend on upstream calls before retries stop; the client has usually given up by then
+RETRY_DEADLINE = int(os.environ.get('RETRY_DEADLINE', 20))
+
+# Monotonic deadline shared by every call_with_backoff made while serving one request
+_retry_deadline = contextvars.ContextVar('retry_deadline', default=None)
+
+@contextlib.contextmanager
+def retry_budget(seconds):
+    """Limit the retrying done by call_with_backoff inside this block to a shared budget of seconds"""
+    token = _retry_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _retry_deadline.reset(token)
+
+def call_with_backoff(func, *args, **kwargs):
+    """
+    Call func, retrying network errors and 429/5xx responses with exponential backoff and jitter.
+
+    Gives up with the last error once the next wait would pass the
+    deadline of the enclosing retry_budget, or RETRY_DEADLINE seconds
+    from the first attempt outside of one.
+    """
+    deadline = _retry_deadline.get() or time.monotonic() + RETRY_DEADLINE
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            return func(*args, **kwargs)
+        except (requests.exceptions.RequestException, ResponseError) as e:
+            response = getattr(e, 'response', None)
+            status_code = getattr(response, 'status_code', None)
+            if attempt == RETRY_ATTEMPTS - 1 or (status_code is not None and status_code not in RETRY_STATUS_CODES):
+                raise
+
+            wait = min(RETRY_MAX_WAIT, RETRY_INITIAL_WAIT * 2 ** attempt) + random.uniform(0, RETRY_INITIAL_WAIT)
+            # Honor Retry-After (in seconds) when Google sends one with a 429/503
+            retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+            if retry_after.isdigit():
+                wait = max(wait, min(int(retry_after), RETRY_AFTER_MAX_WAIT))
+            if time.monotonic() + wait > deadline:
+                logger.warning(f"Giving up on {getattr(func, '__name__', func)} after {attempt + 1} attempts: waiting {wait:.1f}s more would pass the retry deadline")
+                raise
+
+            logger.warning(f"Attempt {attempt + 1}/{RETRY_ATTEMPTS} of {getattr(func, '__name__', func)} failed: {str(e)}, retrying in {wait:.1f}s")
+            time.sleep(wait)
+
+# TLS verification stays on; set PYTRENDS_INSECURE=true only for networks that break it
+VERIFY_TLS = os.environ.get('PYTRENDS_INSECURE', 'false').lower() != 'true'
+
+# Parse the CA bundle once and share the context across every Google Trends connection
+_SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+
+class SSLContextAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools all use the shared, preloaded SSL context"""
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = _SSL_CONTEXT
+        return super().init_poolmanager(*args, **kwargs)
+
+@functools.lru_cache(maxsize=None)
+def _create_trends_adapter(retries, backoff_factor, verify):
+    """Return the HTTPAdapter, and so the connection pool, shared by every Google Trends client with this retry policy"""
+    retry = Retry(
+        total=retries,
+        read=retries,
+        connect=retries,
+        backoff_factor=backoff_factor,
+        allowed_methods=frozenset(['GET', 'POST'])
+    )
+    # No status_forcelist: only connection and read failures retry here. 429 and 5xx
+    # surface to call_with_backoff, which honours Retry-After and owns the attempt budget
+    # Every pooled and memoized client sends through this adapter, so keep enough connections alive for all of them
+    adapter_class = SSLContextAdapter if verify else HTTPAdapter
+    return adapter_class(pool_maxsize=32, max_retries=retry)
+
+def _create_trends_session(retries, backoff_factor, verify):
+    """
+    Create a requests.Session for one Google Trends client.
+
+    Each client keeps its own cookie jar, since Google's NID cookie is
+    per client, while connections come from the adapter shared by every
+    client with the same retry policy.
+    """
+    session = requests.Session()
+    session.mount('https://', _create_trends_adapter(retries, backoff_factor, verify))
+    return session
+
+class SessionTrendReq(TrendReq):
+    """
+    TrendReq that sends every request through its own persistent requests.Session.
+
+    pytrends opens a new session (and TLS connection) for each request and
+    builds its Retry with an argument urllib3 2 no longer accepts.
+    Proxies are not supported since this server never configures them.
+    """
+    def __init__(self, session, **kwargs):
+        # The session must exist before TrendReq.__init__ fetches the Google cookie
+        self.session = session
+        super().__init__(**kwargs)
+
+    def GetGoogleCookie(self):
+        """Get the Google NID cookie through the persistent session"""
+        response = self.session.get(
+            f'{BASE_TRENDS_URL}/explore/?geo={self.hl[-2:]}',
+            timeout=self.timeout,
+            **self.requests_args
+        )
+        self.cookie_fetched_at = time.monotonic()
+        return dict(filter(lambda i: i[0] == 'NID', response.cookies.items()))
+
+    def refresh_cookie(self, max_age):
+        """Fetch a new Google cookie once the current one is older than max_age seconds"""
+        if time.monotonic() - self.cookie_fetched_at > max_age:
+            self.cookies = self.GetGoogleCookie()
+
+    def _get_data(self, url, method=TrendReq.GET_METHOD, trim_chars=0, **kwargs):
+        """Send a request to Google through the persistent session and return the parsed JSON"""
+        send = self.session.post if method == TrendReq.POST_METHOD else self.session.get
+        response = send(
+            url,
+            timeout=self.timeout,
+            cookies=self.cookies,
+            headers=self.headers,
+            **kwargs,
+            **self.requests_args
+        )
+
+        # Google answers with application/json, application/javascript or text/javascript
+        content_type = response.headers.get('Content-Type', '')
+        if response.status_code == 200 and any(t in content_type for t in ('application/json', 'application/javascript', 'text/javascript')):
+            # Some responses start with garbage characters like ")]}'," that must be trimmed
+            if orjson is not None:
+                # The prefix is ASCII, so trimming bytes skips the decode to str
+                return orjson.loads(response.content[trim_chars:])
+            return json.loads(response.text[trim_chars:])
+
+        if response.status_code == 429:
+            raise TooManyRequestsError.from_response(response)
+        raise ResponseError.from_response(response)
+
+# Google starts rejecting NID cookies after a while, so long-lived clients renew them
+TRENDREQ_COOKIE_MAX_AGE = 1800
+
+_trendreq_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=8)
+def _create_trendreq(hl, tz, timeout, retries, backoff_factor):
+    return SessionTrendReq(
+        _create_trends_session(retries, backoff_factor, VERIFY_TLS),
+        hl=hl,
+        tz=tz,
+        timeout=timeout,
+        retries=retries,
+        backoff_factor=backoff_factor,
+        requests_args={'verify': VERIFY_TLS}
+    )
+
+def _get_trendreq(hl, tz, timeout=(2, 5), retries=0, backoff_factor=0):
+    """Return a memoized TrendReq so repeat calls reuse its Google cookie and connections"""
+    # Background cache refreshes call this from their own threads
+    with _trendreq_lock:
+        pytrends = _create_trendreq(hl, tz, timeout, retries, backoff_factor)
+        pytrends.refresh_cookie(TRENDREQ_COOKIE_MAX_AGE)
+        return pytrends
+
+# Idle clients kept per (hl, tz), and how many (hl, tz) pairs are pooled at all
+TRENDREQ_POOL_SIZE = 4
+TRENDREQ_POOL_KEYS = 32
+
+TRENDS_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+_trendreq_pool = {}
+_trendreq_pool_lock = threading.Lock()
+
+# Cap concurrent Google Trends calls so a burst queues here instead of tripping Google's rate limits;
+# other endpoints, /health included, keep their own request threads
+TRENDS_MAX_CONCURRENCY = int(os.environ.get('TRENDS_MAX_CONCURRENCY', 16))
+TRENDS_SLOT_TIMEOUT = 30
+_trends_slots = threading.BoundedSemaphore(TRENDS_MAX_CONCURRENCY)
+
+@contextlib.contextmanager
+def checkout_trendreq(hl, tz):
+    """
+    Lend a pooled TrendReq for (hl, tz) to a single caller.
+
+    build_payload stores the query on the client, so a client is never
+    shared between concurrent requests; a new one is created when none
+    is idle and handed back to the pool afterwards. At most
+    TRENDS_MAX_CONCURRENCY clients are lent out at once.
+    """
+    if not _trends_slots.acquire(timeout=TRENDS_SLOT_TIMEOUT):
+        raise RuntimeError("Too many concurrent Google Trends requests, try again later")
+    try:
+        with _checkout_pooled_trendreq(hl, tz) as pytrends:
+            yield pytrends
+    finally:
+        _trends_slots.release()
+
+@contextlib.contextmanager
+def _checkout_pooled_trendreq(hl, tz):
+    """Take an idle TrendReq for (hl, tz) from the pool, or create one, and return it afterwards"""
+    key = (hl, tz)
+    with _trendreq_pool_lock:
+        idle = _trendreq_pool.get(key)
+        pytrends = idle.pop() if idle else None
+
+    if pytrends is None:
+        pytrends = SessionTrendReq(
+            _create_trends_session(2, 0.5, VERIFY_TLS),
+            hl=hl,
+            tz=tz,
+            timeout=(10, 25),
+            retries=2,
+            backoff_factor=0.5,
+            requests_args={
+                'verify': VERIFY_TLS,
+                'headers': {'User-Agent': TRENDS_USER_AGENT}
+            }
+        )
+    else:
+        pytrends.refresh_cookie(TRENDREQ_COOKIE_MAX_AGE)
+
+    try:
+        yield pytrends
+    finally:
+        with _trendreq_pool_lock:
+            idle = _trendreq_pool.get(key)
+            if idle is None and len(_trendreq_pool) < TRENDREQ_POOL_KEYS:
+                idle = _trendreq_pool[key] = []
+            if idle is not None and len(idle) < TRENDREQ_POOL_SIZE:
+                idle.append(pytrends)
+
+def _create_suggest_session():
+    """Create a keep-alive requests.Session for Google Suggest lookups"""
+    session = requests.Session()
+    session.headers['Connection'] = 'keep-alive'
+    # Large enough pool for the niche-topics fanout to keep every connection open
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=32,
+        max_retries=Retry(total=2, backoff_factor=0.3)
+    )
+    session.mount('https://', adapter)
+    return session
+
+# One pooled session so back-to-back suggestion calls skip the TCP/TLS handshake
+_SUGGEST_SESSION = _create_suggest_session()
+
+# Seconds a Google Suggest response is reused before being fetched again
+SUGGESTIONS_CACHE_TTL = 300
+
+# Paces requests that actually reach Google Suggest: 10 calls per second; cache hits are free
+suggest_rate_limiter = RateLimiter(max_calls=10, time_frame=1)
+
+@functools.lru_cache(maxsize=4096)
+def _cached_suggestions(keyword, language, region, epoch):
+    """Fetch Google Suggest completions; epoch buckets the cache into SUGGESTIONS_CACHE_TTL windows"""
     url = "https://suggestqueries.google.com/complete/search"
     params = {
-        "client": "firefox",
+        "client": "firefox",  # Using firefox client for JSON response
         "q": keyword,
         "hl": language,
         "gl": region,
         "ie": "UTF-8",
         "oe": "UTF-8"
     }
-    
+
+    suggest_rate_limiter.wait()
+    response = _SUGGEST_SESSION.get(url, params=params, timeout=5)
+    # Raising keeps failures out of the cache
+    if response.status_code != 200:
+        raise ValueError(f"HTTP {response.status_code}")
+
+    # Parse suggestions from the raw response bytes
+    if orjson is not None:
+        data = orjson.loads(response.content)
+    else:
+        data = json.loads(response.content.decode('utf-8'))
+    # A tuple so callers can't mutate the cached entry
+    return tuple(data[1])
+
+def fetch_suggestions(keyword, language="en", region="us"):
+    """Return Google Suggest completions, cached for SUGGESTIONS_CACHE_TTL seconds"""
+    return _cached_suggestions(keyword, language, region, int(time.time() // SUGGESTIONS_CACHE_TTL))
+
+def get_google_suggestions(keyword, num_suggestions=10, language="en", region="us"):
+    """Get autocomplete suggestions from Google"""
     try:
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            data = json.loads(response.content.decode("utf-8"))
-            suggestions = data[1]
-            return suggestions
-        else:
-            logger.error(f"Error fetching suggestions: {response.status_code}")
-            return []
+        return list(fetch_suggestions(keyword, language, region))
     except Exception as e:
         logger.error(f"Error getting Google suggestions: {str(e)}")
         return []
 
-def get_trending_searches(pn='united_states', hl='en-US', tz=360):
-    """Get trending searches for a given country"""
-    logger.info(f"Getting trending searches for country: {pn}")
-    
-    # Import dependencies
-    from pytrends.request import TrendReq
-    import pandas as pd
-    
-    # Known working country formats
-    known_countries = {
-        'united_states': 'united_states',
-        'us': 'united_states',
-        'uk': 'united_kingdom',
-        'united_kingdom': 'united_kingdom', 
-        'japan': 'japan',
-        'canada': 'canada',
-        'germany': 'germany',
-        'india': 'india',
-        'australia': 'australia',
-        'brazil': 'brazil',
-        'france': 'france',
-        'mexico': 'mexico',
-        'italy': 'italy'
+# Known working country formats for trending searches
+_KNOWN_COUNTRIES = MappingProxyType({
+    'united_states': 'united_states',
+    'us': 'united_states',
+    'uk': 'united_kingdom',
+    'united_kingdom': 'united_kingdom',
+    'japan': 'japan',
+    'canada': 'canada',
+    'germany': 'germany',
+    'india': 'india',
+    'australia': 'australia',
+    'brazil': 'brazil',
+    'france': 'france',
+    'mexico': 'mexico',
+    'italy': 'italy'
+})
+
+# Short country codes whose trending searches can be retried in pytrends' long form
+_ALIAS_CODES = MappingProxyType({
+    'us': 'united_states',
+    'uk': 'united_kingdom',
+    'jp': 'japan',
+    'ca': 'canada',
+    'de': 'germany',
+    'in': 'india',
+    'au': 'australia'
+})
+
+# Known working country codes for realtime trending searches
+_SUPPORTED_COUNTRIES = frozenset([
+    'AR', 'AU', 'AT', 'BE', 'BR', 'CA', 'CL', 'CO', 'CZ', 'DK',
+    'EG', 'FI', 'FR', 'DE', 'GR', 'HK', 'HU', 'IN', 'ID', 'IE',
+    'IL', 'IT', 'JP', 'KE', 'MY', 'MX', 'NL', 'NZ', 'NG', 'NO',
+    'PL', 'PT', 'PH', 'RO', 'RU', 'SA', 'SG', 'ZA', 'KR', 'ES',
+    'SE', 'CH', 'TW', 'TH', 'TR', 'UA', 'GB', 'US', 'VN'
+])
+
+# Convert country names to codes for realtime trending searches
+_COUNTRY_MAP = MappingProxyType({
+    'united_states': 'US',
+    'india': 'IN',
+    'brazil': 'BR',
+    'mexico': 'MX',
+    'united_kingdom': 'GB',
+    'france': 'FR',
+    'germany': 'DE',
+    'italy': 'IT',
+    'spain': 'ES',
+    'canada': 'CA',
+    'australia': 'AU',
+    'japan': 'JP'
+})
+
+def _normalize_country(pn, table, default):
+    """Look up a country name or alias in a normalization table"""
+    return table.get(pn.casefold(), default)
+
+def _shape_trending_result(df, pn):
+    """Format a trending_searches result (Series, DataFrame or other) as a response"""
+    # Let pandas build the {"query": ...} records in one pass
+    if isinstance(df, pd.Series):
+        data = df.rename('query').to_frame().to_dict('records')
+    elif isinstance(df, pd.DataFrame):
+        if len(df.columns) == 1 and not df.empty:
+            data = df.set_axis(['query'], axis=1).to_dict('records')
+        else:
+            data = df.to_dict('records')
+    else:
+        data = [{"query": str(df)}]
+
+    return {
+        "pn": pn,
+        "data": data
     }
+
+def get_trending_searches(pn='united_states', hl='en-US', tz=360, refresh=False):
+    """Get trending searches for a given country, served from the disk cache when possible"""
+    result, stale = trending_cache.get_or_fetch(
+        ('trending_searches', pn, hl),
+        TRENDING_CACHE_TTL,
+        lambda: fetch_trending_searches(pn=pn, hl=hl, tz=tz),
+        refresh=refresh
+    )
+    if stale:
+        result = dict(result, stale=True)
+    return result
+
+def fetch_trending_searches(pn='united_states', hl='en-US', tz=360):
+    """Fetch trending searches for a given country from Google Trends"""
+    logger.info(f"Getting trending searches for country: {pn}")
     
-    # Use known country format if available
-    country = known_countries.get(pn.lower(), pn).upper()
+    # Use known country format if available; pytrends keys its results by the lowercase long name
+    country = _normalize_country(pn, _KNOWN_COUNTRIES, pn).casefold()
     
     # Initialize PyTrends with backoff factor to handle rate limiting
-    pytrends = TrendReq(hl=hl, tz=tz, timeout=(10,25), retries=2, backoff_factor=0.5)
+    pytrends = _get_trendreq(hl, tz, timeout=(10,25), retries=2, backoff_factor=0.5)
     
     # Try getting data with the primary format
     try:
-        df = pytrends.trending_searches(pn=country)
-        
-        # Handle different result formats
-        if isinstance(df, pd.Series):
-            result = df.tolist()
-            return {
-                "pn": pn,
-                "data": [{"query": item} for item in result]
-            }
-        elif isinstance(df, pd.DataFrame):
-            if len(df.columns) == 1 and not df.empty:
-                result = df[df.columns[0]].tolist()
-                return {
-                    "pn": pn,
-                    "data": [{"query": item} for item in result]
-                }
-            else:
-                return {
-                    "pn": pn,
-                    "data": df.to_dict('records')
-                }
-        else:
-            return {
-                "pn": pn,
-                "data": [{"query": str(df)}]
-            }
+        df = call_with_backoff(pytrends.trending_searches, pn=country)
+        return _shape_trending_result(df, pn)
             
     except Exception as e:
-        # Try alternate format for certain countries
-        if country.lower() in ['us', 'uk', 'jp', 'ca', 'de', 'in', 'au']:
+        # Try the lowercase long form pytrends keys its results by for short country codes
+        if pn.casefold() in _ALIAS_CODES:
             try:
-                df = pytrends.trending_searches(pn=country.upper())
-                
-                if isinstance(df, pd.Series):
-                    result = df.tolist()
-                    return {
-                        "pn": pn,
-                        "data": [{"query": item} for item in result]
-                    }
-                else:
-                    return {
-                        "pn": pn,
-                        "data": df.to_dict('records')
-                    }
+                df = call_with_backoff(pytrends.trending_searches, pn=_ALIAS_CODES[pn.casefold()])
+                return _shape_trending_result(df, pn)
             except Exception as e2:
                 logger.error(f"Both formats failed: {str(e)} and {str(e2)}")
                 raise ValueError(f"Failed to get trending searches for {pn}: {str(e)}")
         else:
             raise ValueError(f"Failed to get trending searches for {pn}: {str(e)}")
 
-def get_realtime_trending_searches(pn='US', hl='en-US', tz=360, cat="all"):
+def get_realtime_trending_searches(pn='US', hl='en-US', tz=360, cat="all", refresh=False):
     """Get realtime trending searches for a given country"""
     logger.info(f"Getting realtime trending searches for country: {pn}")
     
-    # Import dependencies
-    from pytrends.request import TrendReq
-    from pytrends import dailydata
-    import pandas as pd
-    from datetime import datetime
-    
-    # Known working country codes
-    supported_countries = [
-        'AR', 'AU', 'AT', 'BE', 'BR', 'CA', 'CL', 'CO', 'CZ', 'DK',
-        'EG', 'FI', 'FR', 'DE', 'GR', 'HK', 'HU', 'IN', 'ID', 'IE',
-        'IL', 'IT', 'JP', 'KE', 'MY', 'MX', 'NL', 'NZ', 'NG', 'NO',
-        'PL', 'PT', 'PH', 'RO', 'RU', 'SA', 'SG', 'ZA', 'KR', 'ES',
-        'SE', 'CH', 'TW', 'TH', 'TR', 'UA', 'GB', 'US', 'VN'
-    ]
-    
-    # Convert country names to codes
-    country_map = {
-        'united_states': 'US',
-        'india': 'IN',
-        'brazil': 'BR',
-        'mexico': 'MX',
-        'united_kingdom': 'GB',
-        'france': 'FR',
-        'germany': 'DE',
-        'italy': 'IT',
-        'spain': 'ES',
-        'canada': 'CA',
-        'australia': 'AU',
-        'japan': 'JP'
-    }
-
     # Normalize country input
-    pn = country_map.get(pn.lower(), pn[:2].upper())
+    pn = _normalize_country(pn, _COUNTRY_MAP, pn[:2].upper())
 
     # Validate country code
-    if pn not in supported_countries:
-        raise ValueError(f"Invalid country code: {pn}. Supported countries: {', '.join(supported_countries)}")
+    if pn not in _SUPPORTED_COUNTRIES:
+        raise ValueError(f"Invalid country code: {pn}. Supported countries: {', '.join(sorted(_SUPPORTED_COUNTRIES))}")
     
-    # Initialize PyTrends with basic parameters and SSL verification disabled
-    # This improves reliability for some connections
-    pytrends = TrendReq(
-        hl=hl,
-        tz=tz,
-        timeout=(10,25),
-        retries=3,
-        backoff_factor=0.5,
-        requests_args={'verify': False}
-    )
+    stale = False
+    try:
+        result, stale = trending_cache.get_or_fetch(
+            ('realtime_trending_searches', pn, hl, cat),
+            REALTIME_CACHE_TTL,
+            lambda: fetch_realtime_trending_searches(pn=pn, hl=hl, tz=tz),
+            refresh=refresh
+        )
+    except Exception as e:
+        logger.error(str(e))
+        result = [{"note": "Could not retrieve trending searches"}]
+
+    response = {
+        "pn": pn,
+        "cat": cat,
+        "data": result
+    }
+    if stale:
+        response["stale"] = True
+    return response
+
+def fetch_realtime_trending_searches(pn='US', hl='en-US', tz=360):
+    """Fetch realtime trending searches, falling back to daily trends"""
+    # Initialize PyTrends with retries for flaky connections
+    pytrends = _get_trendreq(hl, tz, timeout=(10,25), retries=3, backoff_factor=0.5)
     
-    result = []
     try:
         # Attempt realtime API first
-        df = pytrends.realtime_trending_searches(pn=pn)
+        df = call_with_backoff(pytrends.realtime_trending_searches, pn=pn)
         result = process_realtime_data(df)
         
         if not result:  # Fallback if empty response
             raise ValueError("Empty realtime data")
+        return result
             
     except Exception as e:
         logger.warning(f"Realtime failed: {str(e)}, trying daily trends")
@@ -210,45 +725,212 @@ def get_realtime_trending_searches(pn='US', hl='en-US', tz=360, cat="all"):
                 date=datetime.now().strftime('%Y%m%d'),
                 hl=hl
             )
-            result = process_daily_data(df)
+            return process_daily_data(df)
         except Exception as inner_e:
-            logger.error(f"Daily trends also failed: {str(inner_e)}")
-            result = [{"note": "Could not retrieve trending searches"}]
+            raise ValueError(f"Daily trends also failed: {str(inner_e)} (realtime error: {str(e)})")
 
-    return {
-        "pn": pn,
-        "cat": cat,
-        "data": result
-    }
+# Shared stand-in for missing nested objects, so rows without one don't allocate a dict
+_EMPTY_DICT = MappingProxyType({})
 
 def process_realtime_data(df):
     """Clean and format realtime data"""
     if df is None or df.empty:
         return []
         
-    clean_result = []
-    for item in df.to_dict('records'):
-        clean_item = {
-            "title": item.get('title', ''),
-            "traffic": item.get('formattedTraffic', ''),
-            "image": item.get('image', {}).get('newsUrl', ''),
+    # Project each column once instead of building a dict per row
+    blank = [''] * len(df)
+    titles = df['title'].tolist() if 'title' in df else blank
+    traffics = df['formattedTraffic'].tolist() if 'formattedTraffic' in df else blank
+    images = df['image'].map(lambda image: (image or _EMPTY_DICT).get('newsUrl', '')).tolist() if 'image' in df else blank
+    articles = df['articles'].tolist() if 'articles' in df else [None] * len(df)
+
+    return [
+        {
+            "title": title,
+            "traffic": traffic,
+            "image": image,
             "articles": [
                 {"title": art.get('title', ''), "url": art.get('url', '')}
-                for art in item.get('articles', [])
+                for art in (arts or ())
             ]
         }
-        clean_result.append(clean_item)
-    return clean_result
+        for title, traffic, image, arts in zip(titles, traffics, images, articles)
+    ]
 
 def process_daily_data(df):
     """Clean and format daily trends data"""
     if df is None or df.empty:
         return []
     try:
-        return df[['title', 'traffic', 'related_queries']].to_dict('records')
+        return _frame_to_records(df[['title', 'traffic', 'related_queries']])
     except:
         # Fallback if columns are different
-        return df.to_dict('records')
+        return _frame_to_records(_format_datetime_columns(df))
+
+def _frame_to_records(df):
+    """Convert a DataFrame to a list of row dicts, using Arrow's columnar converters when available"""
+    if pyarrow is not None:
+        try:
+            return pyarrow.Table.from_pandas(df, preserve_index=False).to_pylist()
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, pyarrow.ArrowNotImplementedError) as e:
+            # Mixed-type object columns can't be inferred by Arrow; pandas handles them
+            logger.debug(f"Arrow conversion failed, using pandas: {str(e)}")
+    # Pull each column out once and zip the rows, instead of boxing cell by cell
+    columns = list(df.columns)
+    values = [df.iloc[:, i].tolist() for i in range(len(columns))]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+# Response layouts for DataFrame results: a list of row objects, column names plus row arrays,
+# or one array per column keyed by its name
+FRAME_LAYOUTS = ('records', 'split', 'columnar')
+
+# str(pd.Timestamp) for the whole-second, tz-naive dates pytrends returns, which is how they were always serialized
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def frame_to_payload(df, layout='records'):
+    """Convert a pytrends DataFrame, index included, into response data in the requested layout"""
+    if df.empty:
+        if layout == 'split':
+            return {"columns": [], "data": []}
+        return {} if layout == 'columnar' else []
+    # Format dates per column instead of boxing a Timestamp per cell and stringifying it during encoding
+    df = _format_datetime_columns(df.reset_index(), _TIMESTAMP_FORMAT, include=('datetime',))
+    if layout == 'split':
+        # Column names are written once instead of repeated in every row
+        values = [df.iloc[:, i].tolist() for i in range(df.shape[1])]
+        return {"columns": [str(column) for column in df.columns], "data": [list(row) for row in zip(*values)]}
+    if layout == 'columnar':
+        # Each column is a single list, so no names are repeated and nothing is transposed
+        return {str(column): df.iloc[:, i].tolist() for i, column in enumerate(df.columns)}
+    return _frame_to_records(df)
+
+def related_to_payload(data, keywords):
+    """Convert pytrends related_topics/related_queries results into top/rising records per keyword"""
+    result = {}
+    for kw in keywords:
+        entry = data.get(kw) or {}
+        top, rising = entry.get("top"), entry.get("rising")
+        result[kw] = {
+            "top": _frame_to_records(top) if top is not None else [],
+            "rising": _frame_to_records(rising) if rising is not None else []
+        }
+    return result
+
+# Longest keyword list accepted by endpoints that split it across several payloads
+MAX_BATCHED_KEYWORDS = 20
+
+def fetch_related(kind, keywords, hl, tz, cat=0, timeframe='today 3-m', geo=''):
+    """
+    Fetch related topics or queries for any number of keywords.
+
+    Google Trends takes at most MAX_TRENDS_KEYWORDS terms per payload, so
+    longer lists are split into batches that are fetched concurrently, each
+    on its own pooled client.
+
+    Parameters
+    ----------
+    kind : str
+        "related_topics" or "related_queries"
+    keywords : list
+        Search terms
+    hl, tz : str, int
+        Language and timezone of the TrendReq clients
+    cat, timeframe, geo
+        Passed through to build_payload
+
+    Returns
+    -------
+    dict
+        top/rising records for every keyword
+    """
+    def fetch(batch):
+        with checkout_trendreq(hl, tz) as pytrends:
+            pytrends.build_payload(batch, cat=cat, timeframe=timeframe, geo=geo)
+            return related_to_payload(getattr(pytrends, kind)(), batch)
+
+    batches = [keywords[i:i + MAX_TRENDS_KEYWORDS] for i in range(0, len(keywords), MAX_TRENDS_KEYWORDS)]
+    if len(batches) == 1:
+        return fetch(batches[0])
+    result = {}
+    with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+        for batch_result in executor.map(fetch, batches):
+            result.update(batch_result)
+    return result
+
+def fetch_interest_over_time(keywords, hl, tz, cat=0, timeframe='today 3-m', geo=''):
+    """
+    Fetch interest over time for any number of keywords on one scale.
+
+    Google Trends scales every payload to its own peak, so a longer list is
+    split into batches that all include the first keyword. The batches are
+    fetched concurrently, and each one is rescaled so that keyword lines up
+    with its values in the first batch. The combined result is then scaled
+    so its overall peak is 100, as in a single payload, and only dates
+    present in every batch are kept.
+
+    Parameters
+    ----------
+    keywords : list
+        Search terms; the first is the anchor shared by every batch
+    hl, tz : str, int
+        Language and timezone of the TrendReq clients
+    cat, timeframe, geo
+        Passed through to build_payload
+
+    Returns
+    -------
+    pandas.DataFrame
+        One column per keyword plus isPartial, indexed by date
+
+    Raises
+    ------
+    ParamError
+        When the list needs batching but the first keyword has no interest
+        in one of the batches, so there is nothing to line them up against
+    """
+    def fetch(batch):
+        with checkout_trendreq(hl, tz) as pytrends:
+            pytrends.build_payload(batch, cat=cat, timeframe=timeframe, geo=geo)
+            return pytrends.interest_over_time()
+
+    if len(keywords) <= MAX_TRENDS_KEYWORDS:
+        return fetch(keywords)
+
+    anchor, others = keywords[0], keywords[1:]
+    size = MAX_TRENDS_KEYWORDS - 1
+    batches = [[anchor] + others[i:i + size] for i in range(0, len(others), size)]
+    with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+        frames = list(executor.map(fetch, batches))
+
+    # Google returns an empty frame when no keyword in a batch has any interest
+    anchor_totals = [frame[anchor].sum() if not frame.empty else 0 for frame in frames]
+    for batch, anchor_total in zip(batches, anchor_totals):
+        if not anchor_total:
+            raise ParamError(
+                f"'{anchor}' has no search interest alongside {', '.join(batch[1:])}, so more than "
+                f"{MAX_TRENDS_KEYWORDS} keywords can't be put on one scale; list a keyword with interest first"
+            )
+
+    base = frames[0]
+    columns = [base[batches[0]]]
+    for batch, frame, anchor_total in zip(batches[1:], frames[1:], anchor_totals[1:]):
+        columns.append(frame[batch[1:]] * (anchor_totals[0] / anchor_total))
+    combined = pd.concat(columns, axis=1, join='inner')
+    # A keyword from a later batch can peak above the first batch's 100
+    combined = (combined * (100 / combined.to_numpy().max())).round().astype(int)
+    if 'isPartial' in base:
+        combined['isPartial'] = base['isPartial']
+    return combined
+
+def _format_datetime_columns(df, date_format='%Y-%m-%dT%H:%M:%S', include=('datetime', 'datetimetz')):
+    """Convert datetime columns to strings in one vectorized pass per column"""
+    datetime_columns = df.select_dtypes(include=list(include)).columns
+    if len(datetime_columns) == 0:
+        return df
+    df = df.copy()
+    for column in datetime_columns:
+        df[column] = df[column].dt.strftime(date_format)
+    return df
 
 def google_search(query, num_results=10, lang="en", proxy=None, advanced=False, sleep_interval=0, timeout=5):
     """
@@ -277,10 +959,7 @@ def google_search(query, num_results=10, lang="en", proxy=None, advanced=False,
     """
     logger.info(f"Performing Google search for query: {query}")
     
-    # Import dependencies
-    from googlesearch import search
-    
-    try:
+    def run_search():
         # Execute the search
         results = []
         
@@ -296,8 +975,8 @@ def google_search(query, num_results=10, lang="en", proxy=None, advanced=False,
                 timeout=timeout
             )
             
-            # Process advanced results
-            for result in search_results:
+            # Process advanced results, stopping the generator once we have enough
+            for result in itertools.islice(search_results, num_results):
                 results.append({
                     "title": result.title,
                     "url": result.url,
@@ -316,8 +995,14 @@ def google_search(query, num_results=10, lang="en", proxy=None, advanced=False,
                 timeout=timeout
             )
             
-            # Convert to list if it's a generator
-            results = list(search_results)
+            # Consume the generator only up to num_results to avoid extra result page fetches
+            results = list(itertools.islice(search_results, num_results))
+
+        return results
+
+    try:
+        # The search is a generator, so retry around consuming it
+        results = call_with_backoff(run_search)
         
         return {
             "query": query,
@@ -330,7 +1015,7 @@ def google_search(query, num_results=10, lang="en", proxy=None, advanced=False,
         logger.error(f"Error performing Google search: {str(e)}")
         raise ValueError(f"Failed to perform Google search for '{query}': {str(e)}")
         
-def search_and_analyze(query, num_results=10, include_trends=False, lang="en"):
+def search_and_analyze(query, num_results=10, include_trends=False, lang="en", trend_parts=("interest", "related")):
     """
     Perform a Google search and optionally get trend data for the query
     
@@ -344,6 +1029,8 @@ def search_and_analyze(query, num_results=10, include_trends=False, lang="en"):
         Whether to include trend data for the query (default False)
     lang : str
         The language code (default "en")
+    trend_parts : iterable of str
+        Which trend data to fetch: "interest" and/or "related" (default both)
     
     Returns:
     --------
@@ -367,42 +1054,30 @@ def search_and_analyze(query, num_results=10, include_trends=False, lang="en"):
     # Optionally get trend data
     if include_trends:
         try:
-            # Import dependencies
-            from pytrends.request import TrendReq
-            import pandas as pd
-            
-            # Initialize PyTrends
-            pytrends = TrendReq(hl=f"{lang}-{lang.upper()}", tz=360)
-            
-            # Build payload
-            pytrends.build_payload([query], timeframe='today 3-m')
-            
-            # Get interest over time
-            interest_df = pytrends.interest_over_time()
-            if not interest_df.empty:
-                trend_data = interest_df.reset_index().to_dict('records')
-            else:
-                trend_data = []
+            trend_data = {}
+
+            # Borrow a pooled client so no other request can replace its payload mid-fetch
+            with checkout_trendreq(f"{lang}-{lang.upper()}", 360) as pytrends:
+                # Build payload
+                call_with_backoff(pytrends.build_payload, [query], timeframe='today 3-m')
+
+                # Both read separate widgets from the payload, so their round-trips can overlap;
+                # each runs in a copy of this context so it keeps the request's retry budget
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    # Get interest over time, only if requested
+                    interest_future = executor.submit(contextvars.copy_context().run, call_with_backoff, pytrends.interest_over_time) if "interest" in trend_parts else None
+                    # Get related queries, only if requested
+                    related_future = executor.submit(contextvars.copy_context().run, call_with_backoff, pytrends.related_queries) if "related" in trend_parts else None
+                    interest_df = interest_future.result() if interest_future else None
+                    related = related_future.result() if related_future else None
+
+            if interest_df is not None:
+                trend_data["interest_over_time"] = frame_to_payload(interest_df)
                 
-            # Get related queries
-            related = pytrends.related_queries()
-            related_data = {}
+            if related is not None:
+                trend_data["related_queries"] = related_to_payload(related, [query])[query]
             
-            if query in related and related[query]:
-                if related[query]['top'] is not None:
-                    related_data["top"] = related[query]['top'].to_dict('records')
-                else:
-                    related_data["top"] = []
-                    
-                if related[query]['rising'] is not None:
-                    related_data["rising"] = related[query]['rising'].to_dict('records')
-                else:
-                    related_data["rising"] = []
-            
-            response["trend_data"] = {
-                "interest_over_time": trend_data,
-                "related_queries": related_data
-            }
+            response["trend_data"] = trend_data
             
         except Exception as e:
             logger.warning(f"Could not get trend data: {str(e)}")
@@ -432,43 +1107,23 @@ def get_keyword_suggestions(keyword, num_results=10, lang="en", country="us"):
     logger.info(f"Getting keyword suggestions for: {keyword}")
     
     try:
-        # Import dependencies
-        import requests
-        import json
-        
         # Use the Google Suggest API
-        url = "https://suggestqueries.google.com/complete/search"
-        params = {
-            "client": "firefox",  # Using firefox client for JSON response
-            "q": keyword,
-            "hl": lang,
-            "gl": country,
-            "ie": "UTF-8",
-            "oe": "UTF-8"
+        suggestions = list(fetch_suggestions(keyword, lang, country)[:num_results])
+
+        return {
+            "keyword": keyword,
+            "lang": lang,
+            "country": country,
+            "suggestions": suggestions
         }
-        
-        # Make the request
-        response = requests.get(url, params=params, timeout=5)
-        
-        if response.status_code == 200:
-            # Parse suggestions from the response
-            data = json.loads(response.content.decode('utf-8'))
-            suggestions = data[1][:num_results]
-            
-            return {
-                "keyword": keyword,
-                "lang": lang,
-                "country": country,
-                "suggestions": suggestions
-            }
-        else:
-            logger.error(f"Error getting suggestions: {response.status_code}")
-            raise ValueError(f"Failed to get suggestions: HTTP {response.status_code}")
             
     except Exception as e:
         logger.error(f"Error getting keyword suggestions: {str(e)}")
         raise ValueError(f"Failed to get suggestions for '{keyword}': {str(e)}")
 
+# Concurrent Google Suggest requests per niche-topics level
+NICHE_TOPICS_WORKERS = 8
+
 def get_niche_topics(seed_keyword, depth=2, results_per_level=5, lang="en"):
     """
     Generate a hierarchical list of niche topics related to a seed keyword
@@ -491,173 +1146,379 @@ def get_niche_topics(seed_keyword, depth=2, results_per_level=5, lang="en"):
     """
     logger.info(f"Generating niche topics for: {seed_keyword}, depth={depth}")
     
-    # Import dependencies
-    import time
-    
     # Start with the seed keyword as the root topic
     topic_tree = {
         "keyword": seed_keyword,
         "subtopics": []
     }
     
-    # Queue to process, with (keyword, current_depth, parent) tuples
-    processing_queue = [(seed_keyword, 0, topic_tree["subtopics"])]
-    
-    # Process the queue
-    while processing_queue:
-        current_keyword, current_depth, parent_list = processing_queue.pop(0)
-        
-        # Skip if we've reached max depth
-        if current_depth >= depth:
-            continue
-            
+    def explore(keyword):
         try:
-            # Get suggestions for the current keyword
-            suggestions_result = get_keyword_suggestions(
-                current_keyword, 
+            # Get suggestions for the keyword
+            return get_keyword_suggestions(
+                keyword,
                 num_results=results_per_level,
                 lang=lang
-            )
-            
-            # Create a node for each suggestion
-            for suggestion in suggestions_result["suggestions"]:
-                subtopic = {
-                    "keyword": suggestion,
-                    "subtopics": []
-                }
-                parent_list.append(subtopic)
-                
-                # Add to queue for next level processing
-                if current_depth < depth - 1:
-                    processing_queue.append((suggestion, current_depth + 1, subtopic["subtopics"]))
-            
-            # Add a small delay to avoid rate limiting
-            time.sleep(0.5)
-                
+            )["suggestions"]
         except Exception as e:
-            logger.warning(f"Error exploring '{current_keyword}': {str(e)}")
-            continue
+            logger.warning(f"Error exploring '{keyword}': {str(e)}")
+            return []
+
+    # Keywords to explore at the current level, with the list their subtopics go into
+    current_level = [(seed_keyword, topic_tree["subtopics"])]
+    # Suggestions already fetched, so keywords that reappear in the tree are looked up once
+    processed_keywords = {}
+
+    # Fetch each level's suggestions concurrently instead of one keyword at a time
+    with ThreadPoolExecutor(max_workers=NICHE_TOPICS_WORKERS) as executor:
+        for _ in range(depth):
+            if not current_level:
+                break
+
+            new_keywords = list(dict.fromkeys(
+                keyword for keyword, _ in current_level if keyword not in processed_keywords
+            ))
+            processed_keywords.update(zip(new_keywords, executor.map(explore, new_keywords)))
+
+            # Create a node for each suggestion and queue it for the next level
+            next_level = []
+            for keyword, parent_list in current_level:
+                for suggestion in processed_keywords[keyword]:
+                    subtopic = {
+                        "keyword": suggestion,
+                        "subtopics": []
+                    }
+                    parent_list.append(subtopic)
+                    next_level.append((suggestion, subtopic["subtopics"]))
+            current_level = next_level
     
     return topic_tree
 
-class Handler(http.server.SimpleHTTPRequestHandler):
+class ParamError(ValueError):
+    """A query parameter that is malformed or out of range; handlers answer it with a 400"""
+
+def int_param(query, name, default, minimum=None, maximum=None):
+    """Read an integer query parameter, rejecting values that aren't integers or are out of range"""
+    value = query.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ParamError(f"{name} must be an integer")
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        raise ParamError(f"{name} must be between {minimum} and {maximum}" if maximum is not None else f"{name} must be at least {minimum}")
+    return number
+
+def bool_param(query, name, default):
+    """Read a true/false query parameter; anything other than 'true' is false"""
+    value = query.get(name)
+    if value is None:
+        return default
+    return value.lower() == 'true'
+
+def choice_param(query, name, default, choices):
+    """Read a query parameter that must be one of a fixed set of values"""
+    value = query.get(name, default)
+    if value not in choices:
+        raise ParamError(f"{name} must be one of: {', '.join(choices)}")
+    return value
+
+# Google Trends compares at most five terms per payload
+MAX_TRENDS_KEYWORDS = 5
+
+def keywords_param(query, default='bitcoin', limit=MAX_TRENDS_KEYWORDS):
+    """Read the comma-separated keywords parameter, dropping blank and repeated terms"""
+    keywords = list(dict.fromkeys(kw.strip() for kw in query.get('keywords', default).split(',') if kw.strip()))
+    if not keywords:
+        raise ParamError("keywords must name at least one term")
+    if len(keywords) > limit:
+        raise ParamError(f"keywords accepts at most {limit} terms")
+    return keywords
+
+def parse_query(query_string):
+    """Parse a query string into a flat dict, keeping the first value of repeated keys"""
+    query = {}
+    for key, value in urllib.parse.parse_qsl(query_string):
+        query.setdefault(key, value)
+    return query
+
+if orjson is not None:
+    # Datetimes pass through to default=str so timestamps keep the format json.dumps gave them
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def encode_json(body):
+    """Serialize a response body to JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(body, default=str, option=_ORJSON_OPTIONS)
+    # Response bodies are freshly built trees, never cyclic; emit compact UTF-8 like orjson does
+    return json.dumps(body, default=str, check_circular=False, ensure_ascii=False, separators=(',', ':')).encode()
+
+HEALTH_ENDPOINTS = [
+    "/health",
+    "/search",
+    "/search/combined",
+    "/autocomplete",
+    "/trends",
+    "/trends/interest-over-time",
+    "/trends/multirange-interest-over-time",
+    "/trends/historical-hourly-interest",
+    "/trends/interest-by-region",
+    "/trends/related-topics",
+    "/trends/related-queries",
+    "/trends/trending-searches",
+    "/trends/realtime-trending-searches",
+    "/trends/top-charts",
+    "/trends/suggestions",
+    "/trends/categories",
+    "/niche-topics"
+]
+
+# The /health body around its timestamp, serialized once since load balancers poll it constantly
+_HEALTH_PREFIX = b'{"status":"healthy","time":"'
+_HEALTH_SUFFIX = b'","version":"1.0","endpoints":' + encode_json(HEALTH_ENDPOINTS) + b'}'
+
+# The 501 body never changes, so it is serialized once at startup
+_NOT_IMPLEMENTED_BODY = encode_json({
+    "status": "error",
+    "message": "Endpoint not implemented yet",
+    "available_endpoints": [
+        "/health",
+        "/search?q=bitcoin&num=10&advanced=true",
+        "/search/combined?q=bitcoin&include_trends=true&trend_parts=interest,related",
+        "/autocomplete?keyword=bitcoin&language=en&region=us",
+        "/niche-topics?keyword=bitcoin&depth=2&results_per_level=5",
+        "/trends?keywords=keyword1,keyword2",
+        "/trends/interest-over-time?keywords=keyword1,keyword2&format=split",
+        "/trends/multirange-interest-over-time?keywords=keyword1,keyword2&timeframes=2022-01-01 2022-01-31|2022-03-01 2022-03-31",
+        "/trends/historical-hourly-interest?keywords=keyword1,keyword2&year_start=2022&month_start=1&day_start=1&year_end=2022&month_end=1&day_end=7",
+        "/trends/interest-by-region?keywords=keyword1,keyword2&resolution=COUNTRY",
+        "/trends/related-topics?keywords=keyword1,keyword2",
+        "/trends/related-queries?keywords=keyword1,keyword2",
+        "/trends/trending-searches?pn=united_states&refresh=false",
+        "/trends/realtime-trending-searches?pn=US",
+        "/trends/top-charts?date=2022&geo=GLOBAL",
+        "/trends/suggestions?keyword=bitcoin",
+        "/trends/categories"
+    ]
+})
+
+# Cache-Control for successful responses, so clients and proxies can reuse them instead of asking again
+CACHE_CONTROL = {
+    "/": "no-store",
+    "/health": "no-store",
+    "/autocomplete": f"public, max-age={SUGGESTIONS_CACHE_TTL}",
+    "/trends/categories": f"public, max-age={CATEGORIES_CACHE_TTL}",
+    # Trending lists move quickly, so only let clients hold them briefly
+    "/trends/trending-searches": "public, max-age=60",
+    "/trends/realtime-trending-searches": "public, max-age=60",
+}
+# Other /trends/* results stay valid as long as the server-side cache keeps them
+TRENDS_CACHE_CONTROL = f"public, max-age={TRENDS_CACHE_TTL}"
+
+# Compress JSON bodies at least this large for clients that accept gzip; level 1 is nearly free and
+# still shrinks trend records several times over
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 1
+
+# Cached /trends bodies are sent over and over, so keep their gzipped form instead of recompressing per hit
+gzip_cache = MemoryCache(maxsize=256, ttl=TRENDS_CACHE_TTL)
+
+def compress_body(payload, key=None):
+    """Gzip a response body, reusing the stored result for a key already compressed"""
+    if key is None:
+        return gzip.compress(payload, compresslevel=GZIP_LEVEL)
+    compressed = gzip_cache.get(key)
+    if compressed is None:
+        compressed = gzip_cache.put(key, gzip.compress(payload, compresslevel=GZIP_LEVEL))
+    return compressed
+
+def cache_control_for(path):
+    """Return the Cache-Control value for a successful response on path, or None"""
+    if path in CACHE_CONTROL:
+        return CACHE_CONTROL[path]
+    if path == "/trends" or path.startswith("/trends/"):
+        return TRENDS_CACHE_CONTROL
+    return None
+
+# Seconds a connection may sit idle waiting for its next request before it is closed
+KEEPALIVE_TIMEOUT = int(os.environ.get('KEEPALIVE_TIMEOUT', 5))
+
+# Only do_GET is implemented; SimpleHTTPRequestHandler would also answer HEAD from the working directory
+class Handler(http.server.BaseHTTPRequestHandler):
+    # Send small JSON bodies immediately instead of waiting on delayed ACKs
+    disable_nagle_algorithm = True
+    # Every response carries a Content-Length, so clients can keep the connection open for the next request
+    protocol_version = "HTTP/1.1"
+    # Socket timeout once a request has started, long enough for a slow client to read a large body
+    timeout = int(os.environ.get('SOCKET_TIMEOUT', 60))
+
+    def handle(self):
+        """Serve the requests that have arrived on this connection; Server parks it while it is idle"""
+        self.close_connection = True
+        self.handle_one_request()
+        # Pipelined requests already sit in rfile's buffer, which goes away with this handler
+        while not self.close_connection and self.request_pending():
+            self.handle_one_request()
+
+    def request_pending(self):
+        """Check, without blocking, whether the client has already started sending its next request"""
+        self.connection.settimeout(0)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def send_body(self, status, payload, content_type='application/json'):
+        """Send an already-encoded response body with an explicit Content-Length, gzipped if the client accepts it"""
+        compressible = len(payload) >= GZIP_MIN_SIZE
+        compress = compressible and self.accepts_gzip()
+        if status == 200:
+            digest = hashlib.blake2b(payload, digest_size=8).hexdigest()
+            # The gzipped body is a different representation, so it gets its own tag
+            etag = f'"{digest}-gzip"' if compress else f'"{digest}"'
+            cache_control = cache_control_for(self.request_path)
+            if self.etag_matches(etag):
+                # The client already holds this exact body
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                if cache_control:
+                    self.send_header('Cache-Control', cache_control)
+                if compressible:
+                    self.send_header('Vary', 'Accept-Encoding')
+                self.end_headers()
+                return
+        if compress:
+            payload = compress_body(payload, (digest, len(payload)) if status == 200 else None)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        if compressible:
+            self.send_header('Vary', 'Accept-Encoding')
+        if status == 200:
+            self.send_header('ETag', etag)
+            if cache_control:
+                self.send_header('Cache-Control', cache_control)
+        else:
+            # Errors and rate limits must not be replayed from a cache
+            self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        # wfile is unbuffered, so this goes straight to sendall without another copy
+        self.wfile.write(payload)
+
+    def accepts_gzip(self):
+        """Check whether the request's Accept-Encoding allows a gzip response"""
+        for coding in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = coding.partition(';')
+            if name.strip().lower() in ('gzip', '*'):
+                # "gzip;q=0" explicitly refuses it
+                quality = params.strip().lower().removeprefix('q=')
+                try:
+                    return not quality or float(quality) > 0
+                except ValueError:
+                    return False
+        return False
+
+    def etag_matches(self, etag):
+        """Check the request's If-None-Match header against an ETag"""
+        if_none_match = self.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        # Weak comparison: W/"x" matches "x"
+        return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+    def send_json(self, status, body):
+        """Send body as a JSON response with an explicit Content-Length"""
+        self.send_body(status, encode_json(body))
+
+    def send_cached_json(self, cache_key, fetch, data_key="data"):
+        """
+        Send the /trends response for cache_key, calling fetch() for it only on a miss.
+
+        Repeat requests are served from trends_cache instead of asking Google
+        again, and concurrent identical misses wait for a single fetch. The
+        response dict fetch() returns is encoded once; cache hits send those
+        bytes unchanged. Only the records under data_key are counted when
+        deciding whether a refetch came back smaller, not the request
+        parameters echoed alongside them.
+        """
+        body = trends_cache.get(cache_key)
+        if body is None:
+            def encode():
+                response = fetch()
+                return trends_cache.put(cache_key, encode_json(response), size=record_count(response[data_key]))
+            body = trends_flight.do(cache_key, encode)
+        self.send_body(200, body)
+
+    # Endpoint path -> name of the handler method that takes the parsed query
+    routes = {
+        # Google Search endpoints
+        '/search': 'handle_google_search',
+        '/search/combined': 'handle_combined_search',
+        '/niche-topics': 'handle_niche_topics',
+        # Google Autocomplete endpoint
+        '/autocomplete': 'handle_autocomplete',
+        # Original trends endpoint (backward compatibility)
+        '/trends': 'handle_trends',
+        # New trend endpoints
+        '/trends/interest-over-time': 'handle_interest_over_time',
+        '/trends/multirange-interest-over-time': 'handle_multirange_interest_over_time',
+        '/trends/historical-hourly-interest': 'handle_historical_hourly_interest',
+        '/trends/interest-by-region': 'handle_interest_by_region',
+        '/trends/related-topics': 'handle_related_topics',
+        '/trends/related-queries': 'handle_related_queries',
+        '/trends/trending-searches': 'handle_trending_searches',
+        '/trends/realtime-trending-searches': 'handle_realtime_trending_searches',
+        '/trends/top-charts': 'handle_top_charts',
+        '/trends/suggestions': 'handle_suggestions',
+        '/trends/categories': 'handle_categories',
+    }
+
     def do_GET(self):
         if not rate_limiter.is_allowed():
             self.send_error(429, "Too Many Requests")
             return
-        
-        rate_limiter.add_call()
 
         # Parse the URL
-        parsed_url = urllib.parse.urlparse(self.path)
-        path = parsed_url.path
-        query_string = parsed_url.query
-        query = urllib.parse.parse_qs(query_string)
+        parsed_url = urllib.parse.urlsplit(self.path)
+        # Kept for send_body, so the Cache-Control lookup doesn't parse the URL again
+        path = self.request_path = parsed_url.path
         
         logger.info(f"Received request for path: {path}")
 
-        # Health check endpoint
+        # Health check endpoint, answered before any query parsing
         if path == '/health' or path == '/':
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            response = {
-                "status": "healthy",
-                "time": str(datetime.now()),
-                "version": "1.0",
-                "endpoints": [
-                    "/health",
-                    "/search",
-                    "/search/combined",
-                    "/autocomplete",
-                    "/trends",
-                    "/trends/interest-over-time",
-                    "/trends/multirange-interest-over-time",
-                    "/trends/historical-hourly-interest",
-                    "/trends/interest-by-region",
-                    "/trends/related-topics",
-                    "/trends/related-queries",
-                    "/trends/trending-searches",
-                    "/trends/realtime-trending-searches",
-                    "/trends/top-charts",
-                    "/trends/suggestions",
-                    "/trends/categories",
-                    "/niche-topics"
-                ]
-            }
-            self.wfile.write(json.dumps(response).encode())
-            return
-
-        # Google Search endpoints
-        elif path == '/search':
-            self.handle_google_search(query)
-            return
-        elif path == '/search/combined':
-            self.handle_combined_search(query)
-            return
-        elif path == '/niche-topics':
-            self.handle_niche_topics(query)
+            # Only the timestamp changes, so splice it between the prebuilt halves
+            self.send_body(200, _HEALTH_PREFIX + str(datetime.now()).encode() + _HEALTH_SUFFIX)
             return
 
-        # Google Autocomplete endpoint
-        elif path == '/autocomplete':
-            self.handle_autocomplete(query)
-            return
-
-        # Original trends endpoint (backward compatibility)
-        elif path == '/trends':
-            self.handle_trends(query)
-            return
-
-        # New trend endpoints
-        elif path.startswith('/trends/'):
-            endpoint = path[8:]  # Remove '/trends/' prefix
-            
-            if endpoint == 'interest-over-time':
-                self.handle_interest_over_time(query)
-            elif endpoint == 'multirange-interest-over-time':
-                self.handle_multirange_interest_over_time(query)
-            elif endpoint == 'historical-hourly-interest':
-                self.handle_historical_hourly_interest(query)
-            elif endpoint == 'interest-by-region':
-                self.handle_interest_by_region(query)
-            elif endpoint == 'related-topics':
-                self.handle_related_topics(query)
-            elif endpoint == 'related-queries':
-                self.handle_related_queries(query)
-            elif endpoint == 'trending-searches':
-                self.handle_trending_searches(query)
-            elif endpoint == 'realtime-trending-searches':
-                self.handle_realtime_trending_searches(query)
-            elif endpoint == 'top-charts':
-                self.handle_top_charts(query)
-            elif endpoint == 'suggestions':
-                self.handle_suggestions(query)
-            elif endpoint == 'categories':
-                self.handle_categories(query)
-            else:
-                self.handle_not_implemented()
-            return
-
-        # Default response for unimplemented endpoints
-        else:
+        # Look the endpoint up instead of walking an if/elif chain
+        handler = self.routes.get(path)
+        if handler is None:
+            # Default response for unimplemented endpoints
             self.handle_not_implemented()
             return
+        # Upstream retries for this request share one deadline instead of each getting their own
+        with retry_budget(RETRY_DEADLINE):
+            getattr(self, handler)(parse_query(parsed_url.query))
 
     def handle_autocomplete(self, query):
         """Handle Google autocomplete request"""
         try:
             # Get parameters
-            keyword = query.get('keyword', [''])[0]
-            num = int(query.get('num', ['10'])[0])
-            language = query.get('language', ['en'])[0]
-            region = query.get('region', ['us'])[0]
+            keyword = query.get('keyword', '')
+            num = int_param(query, 'num', 10, minimum=1)
+            language = query.get('language', 'en')
+            region = query.get('region', 'us')
 
             if not keyword:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": "Keyword parameter is required"}).encode())
+                self.send_json(400, {"error": "Keyword parameter is required"})
                 return
 
             logger.info(f"Autocomplete request for keyword: {keyword}, language: {language}, region: {region}")
@@ -666,48 +1527,41 @@ class Handler(http.server.SimpleHTTPRequestHandler):
             suggestions = get_google_suggestions(keyword, num, language, region)
 
             # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             response = {
                 "keyword": keyword,
                 "language": language,
                 "region": region,
                 "suggestions": suggestions
             }
-            self.wfile.write(json.dumps(response).encode())
+            self.send_json(200, response)
+
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing autocomplete request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing autocomplete request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_google_search(self, query):
         """Handle Google search endpoint"""
         try:
             # Get parameters
-            search_query = query.get('q', [''])[0]
-            num_results = int(query.get('num', ['10'])[0])
-            lang = query.get('lang', ['en'])[0]
-            advanced = query.get('advanced', ['false'])[0].lower() == 'true'
-            sleep_interval = int(query.get('sleep', ['0'])[0])
-            timeout = int(query.get('timeout', ['5'])[0])
+            search_query = query.get('q', '')
+            num_results = int_param(query, 'num', 10, minimum=1)
+            lang = query.get('lang', 'en')
+            advanced = bool_param(query, 'advanced', False)
+            sleep_interval = int_param(query, 'sleep', 0, minimum=0)
+            timeout = int_param(query, 'timeout', 5, minimum=1)
 
             if not search_query:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
                 error_response = {"error": "Search query (q) parameter is required"}
-                self.wfile.write(json.dumps(error_response).encode())
+                self.send_json(400, error_response)
                 return
 
             logger.info(f"Google search request: q={search_query}, num={num_results}, lang={lang}")
@@ -724,44 +1578,38 @@ class Handler(http.server.SimpleHTTPRequestHandler):
                 )
                 
                 # Send response
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(result, default=str).encode())
+                self.send_json(200, result)
 
             except Exception as search_error:
                 logger.error(f"Search execution error: {str(search_error)}")
                 raise search_error
 
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
+
         except Exception as e:
-            logger.error(f"Error processing Google search request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing Google search request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_combined_search(self, query):
         """Handle combined search and trends analysis endpoint"""
         try:
             # Get parameters
-            search_query = query.get('q', [''])[0]
-            num_results = int(query.get('num', ['10'])[0])
-            include_trends = query.get('include_trends', ['false'])[0].lower() == 'true'
-            lang = query.get('lang', ['en'])[0]
+            search_query = query.get('q', '')
+            num_results = int_param(query, 'num', 10, minimum=1)
+            include_trends = bool_param(query, 'include_trends', False)
+            lang = query.get('lang', 'en')
+            trend_parts = [part for part in query.get('trend_parts', 'interest,related').split(',') if part]
 
             if not search_query:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
                 error_response = {"error": "Search query (q) parameter is required"}
-                self.wfile.write(json.dumps(error_response).encode())
+                self.send_json(400, error_response)
                 return
 
             logger.info(f"Combined search request: q={search_query}, include_trends={include_trends}")
@@ -771,44 +1619,38 @@ class Handler(http.server.SimpleHTTPRequestHandler):
                 query=search_query,
                 num_results=num_results,
                 include_trends=include_trends,
-                lang=lang
+                lang=lang,
+                trend_parts=trend_parts
             )
 
             # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(result, default=str).encode())
+            self.send_json(200, result)
+
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing combined search request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing combined search request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_niche_topics(self, query):
         """Handle niche topics discovery endpoint"""
         try:
             # Get parameters
-            seed_keyword = query.get('keyword', [''])[0]
-            depth = int(query.get('depth', ['2'])[0])
-            results_per_level = int(query.get('results_per_level', ['5'])[0])
-            lang = query.get('lang', ['en'])[0]
+            seed_keyword = query.get('keyword', '')
+            depth = int_param(query, 'depth', 2, minimum=0)
+            results_per_level = int_param(query, 'results_per_level', 5, minimum=1)
+            lang = query.get('lang', 'en')
 
             if not seed_keyword:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
                 error_response = {"error": "Keyword parameter is required"}
-                self.wfile.write(json.dumps(error_response).encode())
+                self.send_json(400, error_response)
                 return
 
             # Validate parameters
@@ -828,9 +1670,6 @@ class Handler(http.server.SimpleHTTPRequestHandler):
             )
 
             # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             response = {
                 "seed_keyword": seed_keyword,
                 "depth": depth,
@@ -838,815 +1677,669 @@ class Handler(http.server.SimpleHTTPRequestHandler):
                 "lang": lang,
                 "topic_tree": topic_tree
             }
-            self.wfile.write(json.dumps(response, default=str).encode())
+            self.send_json(200, response)
+
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing niche topics request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing niche topics request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_not_implemented(self):
         """Handle not implemented endpoints"""
-        self.send_response(501)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps({
-            "status": "error",
-            "message": "Endpoint not implemented yet",
-            "available_endpoints": [
-                "/health",
-                "/search?q=bitcoin&num=10&advanced=true",
-                "/search/combined?q=bitcoin&include_trends=true",
-                "/autocomplete?keyword=bitcoin&language=en&region=us",
-                "/niche-topics?keyword=bitcoin&depth=2&results_per_level=5",
-                "/trends?keywords=keyword1,keyword2",
-                "/trends/interest-over-time?keywords=keyword1,keyword2",
-                "/trends/multirange-interest-over-time?keywords=keyword1,keyword2&timeframes=2022-01-01 2022-01-31|2022-03-01 2022-03-31",
-                "/trends/historical-hourly-interest?keywords=keyword1,keyword2&year_start=2022&month_start=1&day_start=1&year_end=2022&month_end=1&day_end=7",
-                "/trends/interest-by-region?keywords=keyword1,keyword2&resolution=COUNTRY",
-                "/trends/related-topics?keywords=keyword1,keyword2",
-                "/trends/related-queries?keywords=keyword1,keyword2",
-                "/trends/trending-searches?pn=united_states",
-                "/trends/realtime-trending-searches?pn=US",
-                "/trends/top-charts?date=2022&geo=GLOBAL",
-                "/trends/suggestions?keyword=bitcoin",
-                "/trends/categories"
-            ]
-        }).encode())
+        self.send_body(501, _NOT_IMPLEMENTED_BODY)
 
     def handle_trends(self, query):
         """Handle legacy trends endpoint - for backward compatibility"""
         try:
             # Get parameters
-            keywords = query.get('keywords', ['bitcoin'])[0].split(',')
-            timeframe = query.get('timeframe', ['today 3-m'])[0]
-            query_type = query.get('query_type', ['interest_over_time'])[0]
-            geo = query.get('geo', [''])[0]
-            hl = query.get('hl', ['en-US'])[0]
-            tz = int(query.get('tz', ['360'])[0])
-            cat = int(query.get('cat', ['0'])[0])
+            query_type = query.get('query_type', 'interest_over_time')
+            # Interest and related queries can be split across payloads; region maps can't
+            keywords = keywords_param(query, limit=MAX_TRENDS_KEYWORDS if query_type == 'interest_by_region' else MAX_BATCHED_KEYWORDS)
+            timeframe = query.get('timeframe', 'today 3-m')
+            geo = query.get('geo', '')
+            hl = query.get('hl', 'en-US')
+            tz = int_param(query, 'tz', 360, minimum=-1440, maximum=1440)
+            cat = int_param(query, 'cat', 0, minimum=0)
+            layout = choice_param(query, 'format', 'records', FRAME_LAYOUTS)
 
             logger.info(f"Trends request: keywords={keywords}, timeframe={timeframe}, type={query_type}")
 
-            # Import here to avoid impacting health checks
-            from pytrends.request import TrendReq
-            import pandas as pd
-
-            # Initialize PyTrends with custom headers
-            pytrends = TrendReq(
-                hl=hl,
-                tz=tz,
-                requests_args={
-                    'headers': {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    }
+            cache_key = ("trends", tuple(sorted(query.items())))
+
+            def fetch():
+                # Get data based on query type; long keyword lists are fetched in parallel batches
+                if query_type == 'interest_over_time':
+                    data = fetch_interest_over_time(keywords, hl, tz, cat=cat, timeframe=timeframe, geo=geo)
+                    result = frame_to_payload(data, layout)
+                elif query_type == 'related_queries':
+                    result = fetch_related("related_queries", keywords, hl, tz, cat=cat, timeframe=timeframe, geo=geo)
+                elif query_type == 'interest_by_region':
+                    with checkout_trendreq(hl, tz) as pytrends:
+                        pytrends.build_payload(keywords, cat=cat, timeframe=timeframe, geo=geo)
+                        resolution = query.get('resolution', 'COUNTRY')
+                        data = pytrends.interest_by_region(resolution=resolution)
+                    result = frame_to_payload(data, layout)
+                else:
+                    result = {"message": "Unsupported query type"}
+
+                return {
+                    "keywords": keywords,
+                    "timeframe": timeframe,
+                    "query_type": query_type,
+                    "geo": geo,
+                    "data": result
                 }
-            )
 
-            # Build payload
-            pytrends.build_payload(keywords, cat=cat, timeframe=timeframe, geo=geo)
-
-            # Get data based on query type
-            if query_type == 'interest_over_time':
-                data = pytrends.interest_over_time()
-                result = data.reset_index().to_dict('records') if not data.empty else []
-            elif query_type == 'related_queries':
-                data = pytrends.related_queries()
-                result = {}
-                for kw in keywords:
-                    if kw in data and data[kw]:
-                        result[kw] = {
-                            "top": data[kw]["top"].to_dict('records') if data[kw]["top"] is not None else [],
-                            "rising": data[kw]["rising"].to_dict('records') if data[kw]["rising"] is not None else []
-                        }
-            elif query_type == 'interest_by_region':
-                resolution = query.get('resolution', ['COUNTRY'])[0]
-                data = pytrends.interest_by_region(resolution=resolution)
-                result = data.reset_index().to_dict('records') if not data.empty else []
-            else:
-                result = {"message": "Unsupported query type"}
+            self.send_cached_json(cache_key, fetch)
 
-            # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            response = {
-                "keywords": keywords,
-                "timeframe": timeframe,
-                "query_type": query_type,
-                "geo": geo,
-                "data": result
-            }
-            self.wfile.write(json.dumps(response, default=str).encode())
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing trends request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing trends request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e),
                 "sample": True,
                 "data": [{"date": "2025-03-21", "value": 100}]
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_interest_over_time(self, query):
         """Handle interest over time endpoint"""
         try:
             # Get parameters
-            keywords = query.get('keywords', ['bitcoin'])[0].split(',')
-            timeframe = query.get('timeframe', ['today 3-m'])[0]
-            geo = query.get('geo', [''])[0]
-            hl = query.get('hl', ['en-US'])[0]
-            tz = int(query.get('tz', ['360'])[0])
-            cat = int(query.get('cat', ['0'])[0])
+            keywords = keywords_param(query, limit=MAX_BATCHED_KEYWORDS)
+            timeframe = query.get('timeframe', 'today 3-m')
+            geo = query.get('geo', '')
+            hl = query.get('hl', 'en-US')
+            tz = int_param(query, 'tz', 360, minimum=-1440, maximum=1440)
+            cat = int_param(query, 'cat', 0, minimum=0)
+            layout = choice_param(query, 'format', 'records', FRAME_LAYOUTS)
 
             logger.info(f"Interest over time request: keywords={keywords}, timeframe={timeframe}, geo={geo}")
 
-            # Import here to avoid impacting health checks
-            from pytrends.request import TrendReq
-            import pandas as pd
-
-            # Initialize PyTrends with custom headers
-            pytrends = TrendReq(
-                hl=hl,
-                tz=tz,
-                requests_args={
-                    'headers': {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    }
-                }
-            )
+            cache_key = ("interest_over_time", tuple(sorted(query.items())))
 
-            # Build payload
-            pytrends.build_payload(keywords, cat=cat, timeframe=timeframe, geo=geo)
+            def fetch():
+                # Lists longer than one payload are fetched in parallel batches on a shared scale
+                data = fetch_interest_over_time(keywords, hl, tz, cat=cat, timeframe=timeframe, geo=geo)
+                result = frame_to_payload(data, layout)
+
+                return {
+                    "keywords": keywords,
+                    "timeframe": timeframe,
+                    "geo": geo,
+                    "data": result
+                }
 
-            # Get data
-            data = pytrends.interest_over_time()
-            result = data.reset_index().to_dict('records') if not data.empty else []
+            self.send_cached_json(cache_key, fetch)
 
-            # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            response = {
-                "keywords": keywords,
-                "timeframe": timeframe,
-                "geo": geo,
-                "data": result
-            }
-            self.wfile.write(json.dumps(response, default=str).encode())
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing interest over time request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing interest over time request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_multirange_interest_over_time(self, query):
         """Handle multirange interest over time endpoint"""
         try:
             # Get parameters
-            keywords = query.get('keywords', ['bitcoin'])[0].split(',')
-            timeframes = query.get('timeframes', ['2022-01-01 2022-01-31'])[0].split('|')
-            geo = query.get('geo', [''])[0]
-            hl = query.get('hl', ['en-US'])[0]
-            tz = int(query.get('tz', ['360'])[0])
-            cat = int(query.get('cat', ['0'])[0])
+            keywords = keywords_param(query)
+            timeframes = query.get('timeframes', '2022-01-01 2022-01-31').split('|')
+            geo = query.get('geo', '')
+            hl = query.get('hl', 'en-US')
+            tz = int_param(query, 'tz', 360, minimum=-1440, maximum=1440)
+            cat = int_param(query, 'cat', 0, minimum=0)
+            layout = choice_param(query, 'format', 'records', FRAME_LAYOUTS)
 
             logger.info(f"Multirange interest over time request: keywords={keywords}, timeframes={timeframes}, geo={geo}")
 
-            # Import here to avoid impacting health checks
-            from pytrends.request import TrendReq
-            import pandas as pd
-
-            # Initialize PyTrends with custom headers
-            pytrends = TrendReq(
-                hl=hl,
-                tz=tz,
-                requests_args={
-                    'headers': {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    }
-                }
-            )
+            cache_key = ("multirange_interest_over_time", tuple(sorted(query.items())))
+
+            def fetch():
+                with checkout_trendreq(hl, tz) as pytrends:
+                    # Collect data for each timeframe
+                    all_data = []
+                    for timeframe in timeframes:
+                        try:
+                            # Build payload for this timeframe
+                            pytrends.build_payload(keywords, cat=cat, timeframe=timeframe, geo=geo)
+
+                            # Get data
+                            data = pytrends.interest_over_time()
+                            if not data.empty:
+                                # Add a timeframe column to identify the source
+                                data['timeframe'] = timeframe
+                                all_data.append(data)
+                        except Exception as inner_e:
+                            logger.warning(f"Error with timeframe {timeframe}: {str(inner_e)}")
+
+                    # Combine all data frames
+                    if all_data:
+                        combined_data = pd.concat(all_data)
+                        result = frame_to_payload(combined_data, layout)
+                    else:
+                        result = frame_to_payload(pd.DataFrame(), layout)
 
-            # Collect data for each timeframe
-            all_data = []
-            for timeframe in timeframes:
-                try:
-                    # Build payload for this timeframe
-                    pytrends.build_payload(keywords, cat=cat, timeframe=timeframe, geo=geo)
+                return {
+                    "keywords": keywords,
+                    "timeframes": timeframes,
+                    "geo": geo,
+                    "data": result
+                }
 
-                    # Get data
-                    data = pytrends.interest_over_time()
-                    if not data.empty:
-                        # Add a timeframe column to identify the source
-                        data['timeframe'] = timeframe
-                        all_data.append(data)
-                except Exception as inner_e:
-                    logger.warning(f"Error with timeframe {timeframe}: {str(inner_e)}")
-
-            # Combine all data frames
-            if all_data:
-                combined_data = pd.concat(all_data)
-                result = combined_data.reset_index().to_dict('records')
-            else:
-                result = []
+            self.send_cached_json(cache_key, fetch)
 
-            # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            response = {
-                "keywords": keywords,
-                "timeframes": timeframes,
-                "geo": geo,
-                "data": result
-            }
-            self.wfile.write(json.dumps(response, default=str).encode())
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing multirange interest over time request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing multirange interest over time request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_historical_hourly_interest(self, query):
         """Handle historical hourly interest endpoint"""
         try:
             # Get parameters
-            keywords = query.get('keywords', ['bitcoin'])[0].split(',')
+            keywords = keywords_param(query)
 
             # Parse dates
-            try:
-                year_start = int(query.get('year_start', ['2022'])[0])
-                month_start = int(query.get('month_start', ['1'])[0])
-                day_start = int(query.get('day_start', ['1'])[0])
-                hour_start = int(query.get('hour_start', ['0'])[0])
-                year_end = int(query.get('year_end', ['2022'])[0])
-                month_end = int(query.get('month_end', ['1'])[0])
-                day_end = int(query.get('day_end', ['7'])[0])
-                hour_end = int(query.get('hour_end', ['0'])[0])
-                sleep = int(query.get('sleep', ['0'])[0])
-            except ValueError:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                error_response = {"error": "Date parameters must be integers"}
-                self.wfile.write(json.dumps(error_response).encode())
-                return
-
-            geo = query.get('geo', [''])[0]
-            hl = query.get('hl', ['en-US'])[0]
-            tz = int(query.get('tz', ['360'])[0])
-            cat = int(query.get('cat', ['0'])[0])
+            year_start = int_param(query, 'year_start', 2022)
+            month_start = int_param(query, 'month_start', 1, minimum=1, maximum=12)
+            day_start = int_param(query, 'day_start', 1, minimum=1, maximum=31)
+            hour_start = int_param(query, 'hour_start', 0, minimum=0, maximum=23)
+            year_end = int_param(query, 'year_end', 2022)
+            month_end = int_param(query, 'month_end', 1, minimum=1, maximum=12)
+            day_end = int_param(query, 'day_end', 7, minimum=1, maximum=31)
+            hour_end = int_param(query, 'hour_end', 0, minimum=0, maximum=23)
+            sleep = int_param(query, 'sleep', 0, minimum=0)
+
+            geo = query.get('geo', '')
+            hl = query.get('hl', 'en-US')
+            tz = int_param(query, 'tz', 360, minimum=-1440, maximum=1440)
+            cat = int_param(query, 'cat', 0, minimum=0)
+            layout = choice_param(query, 'format', 'records', FRAME_LAYOUTS)
 
             logger.info(f"Historical hourly interest request: keywords={keywords}, start={year_start}-{month_start}-{day_start}, end={year_end}-{month_end}-{day_end}")
 
-            # Import here to avoid impacting health checks
-            from pytrends.request import TrendReq
-            import pandas as pd
-
-            # Initialize PyTrends with custom headers
-            pytrends = TrendReq(
-                hl=hl,
-                tz=tz,
-                requests_args={
-                    'headers': {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    }
+            cache_key = ("historical_hourly_interest", tuple(sorted(query.items())))
+
+            def fetch():
+                with checkout_trendreq(hl, tz) as pytrends:
+                    # Get data
+                    data = pytrends.get_historical_interest(
+                        keywords,
+                        year_start=year_start,
+                        month_start=month_start,
+                        day_start=day_start,
+                        hour_start=hour_start,
+                        year_end=year_end,
+                        month_end=month_end,
+                        day_end=day_end,
+                        hour_end=hour_end,
+                        cat=cat,
+                        geo=geo,
+                        gprop='',
+                        sleep=sleep
+                    )
+                    result = frame_to_payload(data, layout)
+
+                return {
+                    "keywords": keywords,
+                    "start_date": f"{year_start}-{month_start}-{day_start} {hour_start}:00",
+                    "end_date": f"{year_end}-{month_end}-{day_end} {hour_end}:00",
+                    "geo": geo,
+                    "data": result
                 }
-            )
 
-            # Get data
-            data = pytrends.get_historical_interest(
-                keywords,
-                year_start=year_start,
-                month_start=month_start,
-                day_start=day_start,
-                hour_start=hour_start,
-                year_end=year_end,
-                month_end=month_end,
-                day_end=day_end,
-                hour_end=hour_end,
-                cat=cat,
-                geo=geo,
-                gprop='',
-                sleep=sleep
-            )
-            result = data.reset_index().to_dict('records') if not data.empty else []
+            self.send_cached_json(cache_key, fetch)
 
-            # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            response = {
-                "keywords": keywords,
-                "start_date": f"{year_start}-{month_start}-{day_start} {hour_start}:00",
-                "end_date": f"{year_end}-{month_end}-{day_end} {hour_end}:00",
-                "geo": geo,
-                "data": result
-            }
-            self.wfile.write(json.dumps(response, default=str).encode())
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing historical hourly interest request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing historical hourly interest request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_interest_by_region(self, query):
         """Handle interest by region endpoint"""
         try:
             # Get parameters
-            keywords = query.get('keywords', ['bitcoin'])[0].split(',')
-            timeframe = query.get('timeframe', ['today 3-m'])[0]
-            geo = query.get('geo', [''])[0]
-            resolution = query.get('resolution', ['COUNTRY'])[0]
-            inc_low_vol = query.get('inc_low_vol', ['true'])[0].lower() == 'true'
-            inc_geo_code = query.get('inc_geo_code', ['false'])[0].lower() == 'true'
-            hl = query.get('hl', ['en-US'])[0]
-            tz = int(query.get('tz', ['360'])[0])
-            cat = int(query.get('cat', ['0'])[0])
+            keywords = keywords_param(query)
+            timeframe = query.get('timeframe', 'today 3-m')
+            geo = query.get('geo', '')
+            resolution = query.get('resolution', 'COUNTRY')
+            inc_low_vol = bool_param(query, 'inc_low_vol', True)
+            inc_geo_code = bool_param(query, 'inc_geo_code', False)
+            hl = query.get('hl', 'en-US')
+            tz = int_param(query, 'tz', 360, minimum=-1440, maximum=1440)
+            cat = int_param(query, 'cat', 0, minimum=0)
+            layout = choice_param(query, 'format', 'records', FRAME_LAYOUTS)
 
             logger.info(f"Interest by region request: keywords={keywords}, timeframe={timeframe}, geo={geo}, resolution={resolution}")
 
-            # Import here to avoid impacting health checks
-            from pytrends.request import TrendReq
-            import pandas as pd
-
-            # Initialize PyTrends with custom headers
-            pytrends = TrendReq(
-                hl=hl,
-                tz=tz,
-                requests_args={
-                    'headers': {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    }
-                }
-            )
+            cache_key = ("interest_by_region", tuple(sorted(query.items())))
 
-            # Build payload
-            pytrends.build_payload(keywords, cat=cat, timeframe=timeframe, geo=geo)
+            def fetch():
+                with checkout_trendreq(hl, tz) as pytrends:
+                    # Build payload
+                    pytrends.build_payload(keywords, cat=cat, timeframe=timeframe, geo=geo)
 
-            # Get data
-            data = pytrends.interest_by_region(resolution=resolution, inc_low_vol=inc_low_vol, inc_geo_code=inc_geo_code)
-            result = data.reset_index().to_dict('records') if not data.empty else []
+                    # Get data
+                    data = pytrends.interest_by_region(resolution=resolution, inc_low_vol=inc_low_vol, inc_geo_code=inc_geo_code)
+                    result = frame_to_payload(data, layout)
 
-            # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            response = {
-                "keywords": keywords,
-                "timeframe": timeframe,
-                "geo": geo,
-                "resolution": resolution,
-                "data": result
-            }
-            self.wfile.write(json.dumps(response, default=str).encode())
+                return {
+                    "keywords": keywords,
+                    "timeframe": timeframe,
+                    "geo": geo,
+                    "resolution": resolution,
+                    "data": result
+                }
+
+            self.send_cached_json(cache_key, fetch)
+
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing interest by region request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing interest by region request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_related_topics(self, query):
         """Handle related topics endpoint"""
         try:
             # Get parameters
-            keywords = query.get('keywords', ['bitcoin'])[0].split(',')
-            timeframe = query.get('timeframe', ['today 3-m'])[0]
-            geo = query.get('geo', [''])[0]
-            hl = query.get('hl', ['en-US'])[0]
-            tz = int(query.get('tz', ['360'])[0])
-            cat = int(query.get('cat', ['0'])[0])
+            keywords = keywords_param(query, limit=MAX_BATCHED_KEYWORDS)
+            timeframe = query.get('timeframe', 'today 3-m')
+            geo = query.get('geo', '')
+            hl = query.get('hl', 'en-US')
+            tz = int_param(query, 'tz', 360, minimum=-1440, maximum=1440)
+            cat = int_param(query, 'cat', 0, minimum=0)
 
             logger.info(f"Related topics request: keywords={keywords}, timeframe={timeframe}, geo={geo}")
 
-            # Import here to avoid impacting health checks
-            from pytrends.request import TrendReq
-            import pandas as pd
-
-            # Initialize PyTrends with custom headers
-            pytrends = TrendReq(
-                hl=hl,
-                tz=tz,
-                requests_args={
-                    'headers': {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    }
+            cache_key = ("related_topics", tuple(sorted(query.items())))
+
+            def fetch():
+                # Lists longer than one payload are fetched in parallel batches
+                result = fetch_related("related_topics", keywords, hl, tz, cat=cat, timeframe=timeframe, geo=geo)
+
+                return {
+                    "keywords": keywords,
+                    "timeframe": timeframe,
+                    "geo": geo,
+                    "data": result
                 }
-            )
 
-            # Build payload
-            pytrends.build_payload(keywords, cat=cat, timeframe=timeframe, geo=geo)
-
-            # Get data
-            data = pytrends.related_topics()
-            result = {}
-            for kw in keywords:
-                logger.info(f"Processing data for keyword '{kw}'")  # Debugging log
-                if kw in data:
-                    result[kw] = {}
-                    # Check for top topics
-                    if data[kw]['top'] is not None:
-                        result[kw]['top'] = data[kw]['top'].to_dict('records')
-                    else:
-                        result[kw]['top'] = []
-                    # Check for rising topics
-                    if data[kw]['rising'] is not None:
-                        result[kw]['rising'] = data[kw]['rising'].to_dict('records')
-                    else:
-                        result[kw]['rising'] = []
-                else:
-                    result[kw] = {"top": [], "rising": []}
+            self.send_cached_json(cache_key, fetch)
 
-            # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            response = {
-                "keywords": keywords,
-                "timeframe": timeframe,
-                "geo": geo,
-                "data": result
-            }
-            self.wfile.write(json.dumps(response, default=str).encode())
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing related topics request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing related topics request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_related_queries(self, query):
         """Handle related queries endpoint"""
         try:
             # Get parameters
-            keywords = query.get('keywords', ['bitcoin'])[0].split(',')
-            timeframe = query.get('timeframe', ['today 3-m'])[0]
-            geo = query.get('geo', [''])[0]
-            hl = query.get('hl', ['en-US'])[0]
-            tz = int(query.get('tz', ['360'])[0])
-            cat = int(query.get('cat', ['0'])[0])
+            keywords = keywords_param(query, limit=MAX_BATCHED_KEYWORDS)
+            timeframe = query.get('timeframe', 'today 3-m')
+            geo = query.get('geo', '')
+            hl = query.get('hl', 'en-US')
+            tz = int_param(query, 'tz', 360, minimum=-1440, maximum=1440)
+            cat = int_param(query, 'cat', 0, minimum=0)
 
             logger.info(f"Related queries request: keywords={keywords}, timeframe={timeframe}, geo={geo}")
 
-            # Import here to avoid impacting health checks
-            from pytrends.request import TrendReq
-            import pandas as pd
-
-            # Initialize PyTrends with custom headers
-            pytrends = TrendReq(
-                hl=hl,
-                tz=tz,
-                requests_args={
-                    'headers': {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    }
+            cache_key = ("related_queries", tuple(sorted(query.items())))
+
+            def fetch():
+                # Lists longer than one payload are fetched in parallel batches
+                result = fetch_related("related_queries", keywords, hl, tz, cat=cat, timeframe=timeframe, geo=geo)
+
+                return {
+                    "keywords": keywords,
+                    "timeframe": timeframe,
+                    "geo": geo,
+                    "data": result
                 }
-            )
 
-            # Build payload
-            pytrends.build_payload(keywords, cat=cat, timeframe=timeframe, geo=geo)
-
-            # Get data
-            data = pytrends.related_queries()
-            result = {}
-            for kw in keywords:
-                if kw in data and data[kw]:
-                    result[kw] = {
-                        "top": data[kw]["top"].to_dict('records') if data[kw]["top"] is not None else [],
-                        "rising": data[kw]["rising"].to_dict('records') if data[kw]["rising"] is not None else []
-                    }
-                else:
-                    result[kw] = {"top": [], "rising": []}
+            self.send_cached_json(cache_key, fetch)
 
-            # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            response = {
-                "keywords": keywords,
-                "timeframe": timeframe,
-                "geo": geo,
-                "data": result
-            }
-            self.wfile.write(json.dumps(response, default=str).encode())
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing related queries request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing related queries request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_trending_searches(self, query):
         """Handle trending searches endpoint"""
         try:
             # Get parameters
-            pn = query.get('pn', ['united_states'])[0].lower()  # Ensure lowercase
-            hl = query.get('hl', ['en-US'])[0]
-            tz = int(query.get('tz', ['360'])[0])
+            pn = query.get('pn', 'united_states').lower()  # Ensure lowercase
+            hl = query.get('hl', 'en-US')
+            tz = int_param(query, 'tz', 360, minimum=-1440, maximum=1440)
+            refresh = bool_param(query, 'refresh', False)
 
             logger.info(f"Trending searches request: pn={pn}")
 
             # Use the get_trending_searches function from CLI
-            result = get_trending_searches(pn=pn, hl=hl, tz=tz)
+            result = get_trending_searches(pn=pn, hl=hl, tz=tz, refresh=refresh)
             
             # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(result, default=str).encode())
+            self.send_json(200, result)
+
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing trending searches request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing trending searches request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_realtime_trending_searches(self, query):
         """Handle realtime trending searches endpoint"""
         try:
             # Get parameters
-            pn = query.get('pn', ['US'])[0]  # Can be uppercase or lowercase
-            hl = query.get('hl', ['en-US'])[0]
-            tz = int(query.get('tz', ['360'])[0])
-            cat = query.get('cat', ['all'])[0]
+            pn = query.get('pn', 'US')  # Can be uppercase or lowercase
+            hl = query.get('hl', 'en-US')
+            tz = int_param(query, 'tz', 360, minimum=-1440, maximum=1440)
+            cat = query.get('cat', 'all')
+            refresh = bool_param(query, 'refresh', False)
 
             logger.info(f"Realtime trending searches request: pn={pn}")
 
             # Use the get_realtime_trending_searches function from CLI
-            result = get_realtime_trending_searches(pn=pn, hl=hl, tz=tz, cat=cat)
+            result = get_realtime_trending_searches(pn=pn, hl=hl, tz=tz, cat=cat, refresh=refresh)
 
             # Send successful response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(result, default=str).encode())
+            self.send_json(200, result)
+
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing realtime trending searches request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing realtime trending searches request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def _send_validation_error(self, message, supported):
         """Send a validation error response"""
-        self.send_response(400)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
         error_response = {
             "status": "error",
             "message": message,
             "supported_countries": supported
         }
-        self.wfile.write(json.dumps(error_response).encode())
+        self.send_json(400, error_response)
 
     def handle_top_charts(self, query):
         """Handle top charts endpoint"""
         try:
             # Get parameters
-            date = int(query.get('date', ['2021'])[0])
-            geo = query.get('geo', ['GLOBAL'])[0]
-            hl = query.get('hl', ['en-US'])[0]
-            tz = int(query.get('tz', ['360'])[0])
+            date = int_param(query, 'date', 2021)
+            geo = query.get('geo', 'GLOBAL')
+            hl = query.get('hl', 'en-US')
+            tz = int_param(query, 'tz', 360, minimum=-1440, maximum=1440)
 
             logger.info(f"Top charts request: date={date}, geo={geo}")
 
-            # Import here to avoid impacting health checks
-            from pytrends.request import TrendReq
-            import pandas as pd
-
-            # Initialize PyTrends with custom headers
-            pytrends = TrendReq(
-                hl=hl,
-                tz=tz,
-                requests_args={
-                    'headers': {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    }
+            cache_key = ("top_charts", tuple(sorted(query.items())))
+
+            def fetch():
+                with checkout_trendreq(hl, tz) as pytrends:
+                    # Get data
+                    data = pytrends.top_charts(date, geo=geo)
+                    result = data.to_dict('records') if not data.empty else []
+
+                return {
+                    "date": date,
+                    "geo": geo,
+                    "data": result
                 }
-            )
 
-            # Get data
-            data = pytrends.top_charts(date, geo=geo)
-            result = data.to_dict('records') if not data.empty else []
+            self.send_cached_json(cache_key, fetch)
 
-            # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            response = {
-                "date": date,
-                "geo": geo,
-                "data": result
-            }
-            self.wfile.write(json.dumps(response, default=str).encode())
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing top charts request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing top charts request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_suggestions(self, query):
         """Handle keyword suggestions endpoint"""
         try:
             # Get parameters
-            keyword = query.get('keyword', ['bitcoin'])[0]
-            hl = query.get('hl', ['en-US'])[0]
-            tz = int(query.get('tz', ['360'])[0])
+            keyword = query.get('keyword', 'bitcoin')
+            hl = query.get('hl', 'en-US')
+            tz = int_param(query, 'tz', 360, minimum=-1440, maximum=1440)
 
             logger.info(f"Suggestions request: keyword={keyword}")
 
-            # Import here to avoid impacting health checks
-            from pytrends.request import TrendReq
+            # Suggestions depend only on the keyword and language
+            cache_key = ("suggestions", keyword, hl)
 
-            # Initialize PyTrends with custom headers
-            pytrends = TrendReq(
-                hl=hl,
-                tz=tz,
-                requests_args={
-                    'headers': {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    }
+            def fetch():
+                with checkout_trendreq(hl, tz) as pytrends:
+                    # Get data
+                    suggestions = pytrends.suggestions(keyword=keyword)
+
+                return {
+                    "keyword": keyword,
+                    "suggestions": suggestions
                 }
-            )
 
-            # Get data
-            suggestions = pytrends.suggestions(keyword=keyword)
+            self.send_cached_json(cache_key, fetch, data_key="suggestions")
 
-            # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            response = {
-                "keyword": keyword,
-                "suggestions": suggestions
-            }
-            self.wfile.write(json.dumps(response, default=str).encode())
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing suggestions request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing suggestions request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
     def handle_categories(self, query):
         """Handle categories endpoint"""
         try:
             # Get parameters
-            hl = query.get('hl', ['en-US'])[0]
-            tz = int(query.get('tz', ['360'])[0])
+            hl = query.get('hl', 'en-US')
+            tz = int_param(query, 'tz', 360, minimum=-1440, maximum=1440)
 
             logger.info(f"Categories request")
 
-            # Import here to avoid impacting health checks
-            from pytrends.request import TrendReq
-
-            # Initialize PyTrends with custom headers
-            pytrends = TrendReq(
-                hl=hl,
-                tz=tz,
-                requests_args={
-                    'headers': {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    }
-                }
-            )
-
-            # Get data
-            categories = pytrends.categories()
+            # Serve the already-encoded response for this language when we have one
+            body = categories_cache.get(hl)
+            if body is None:
+                with checkout_trendreq(hl, tz) as pytrends:
+                    # Get data
+                    categories = pytrends.categories()
+                body = categories_cache.put(hl, encode_json({"categories": categories}))
 
             # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            response = {
-                "categories": categories
-            }
-            self.wfile.write(json.dumps(response, default=str).encode())
+            self.send_body(200, body)
+
+        except ParamError as e:
+            self.send_json(400, {"error": str(e)})
 
         except Exception as e:
-            logger.error(f"Error processing categories request: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing categories request: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
             
             # Send error response
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             error_response = {
                 "status": "error",
                 "message": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.send_json(500, error_response)
 
 # =============== SERVER STARTUP ===============
-PORT = int(os.environ.get('PORT', 8080))
-logger.info(f"Starting server on 0.0.0.0:{PORT}")
+# Request worker threads; kept above TRENDS_MAX_CONCURRENCY so /health always finds a free worker
+WORKERS = int(os.environ.get('WORKERS', 32))
 
-try:
-    httpd = socketserver.TCPServer(("0.0.0.0", PORT), Handler)
-    logger.info(f"Server started on 0.0.0.0:{PORT}")
-    httpd.serve_forever()
-except Exception as e:
-    logger.error(f"Error in server: {e}")
-    logger.error(traceback.format_exc())
+class Server(http.server.HTTPServer):
+    """
+    HTTP server that handles requests on a fixed pool of WORKERS threads.
+
+    A worker only takes a connection once a request has started to arrive
+    on it. Between requests, and before the first one, connections wait in
+    a selector watched by a single thread instead of holding a worker, so
+    idle keep-alive clients cannot starve the pool. Connections idle for
+    KEEPALIVE_TIMEOUT seconds are closed.
+    """
+    # Room for connection bursts; the socketserver default backlog is 5
+    request_queue_size = 128
+
+    def __init__(self, *args, **kwargs):
+        self.executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="request")
+        self.idle = selectors.DefaultSelector()
+        # Connections handed back since the watcher last looked; the socket pair wakes it up
+        self.parked = []
+        self.parked_lock = threading.Lock()
+        self.wakeup, self.waker = socket.socketpair()
+        self.wakeup.setblocking(False)
+        self.idle.register(self.wakeup, selectors.EVENT_READ)
+        super().__init__(*args, **kwargs)
+        threading.Thread(target=self.watch_idle, name="keepalive", daemon=True).start()
+
+    def process_request(self, request, client_address):
+        """Wait for a new connection's first request without tying up a worker"""
+        self.park(request, client_address)
+
+    def park(self, request, client_address):
+        """Hand a connection to the watcher until its next request arrives"""
+        with self.parked_lock:
+            self.parked.append((request, client_address))
+            wake = len(self.parked) == 1
+        if wake:
+            self.waker.send(b'\0')
+
+    def watch_idle(self):
+        """Pass connections to the worker pool as requests arrive and close those idle too long"""
+        next_sweep = time.monotonic() + 1
+        while True:
+            for key, _ in self.idle.select(timeout=1):
+                if key.fileobj is self.wakeup:
+                    self.wakeup.recv(4096)
+                    continue
+                self.idle.unregister(key.fileobj)
+                self.executor.submit(self.process_request_thread, key.fileobj, key.data[0])
+
+            with self.parked_lock:
+                parked, self.parked = self.parked, []
+            deadline = time.monotonic() + KEEPALIVE_TIMEOUT
+            for request, client_address in parked:
+                try:
+                    self.idle.register(request, selectors.EVENT_READ, (client_address, deadline))
+                except (OSError, ValueError):
+                    self.shutdown_request(request)
+
+            now = time.monotonic()
+            if now >= next_sweep:
+                next_sweep = now + 1
+                for key in list(self.idle.get_map().values()):
+                    if key.data is not None and key.data[1] <= now:
+                        self.idle.unregister(key.fileobj)
+                        self.shutdown_request(key.fileobj)
+
+    def process_request_thread(self, request, client_address):
+        """Serve the requests waiting on a connection, then park it again if the client keeps it open"""
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+        except Exception:
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+            return
+        if handler.close_connection:
+            self.shutdown_request(request)
+        else:
+            self.park(request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+# Only start serving when run as a script, so tests can import the module
+if __name__ == '__main__':
+    PORT = int(os.environ.get('PORT', 8080))
+    logger.info(f"Starting server on 0.0.0.0:{PORT}")
+
+    try:
+        httpd = Server(("0.0.0.0", PORT), Handler)
+        logger.info(f"Server started on 0.0.0.0:{PORT}")
+        httpd.serve_forever()
+    except Exception as e:
+        logger.error(f"Error in server: {e}")
+        logger.error(traceback.format_exc())
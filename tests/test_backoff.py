@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+
+import requests
+
+import server
+
+
+class CallWithBackoffTest(unittest.TestCase):
+    def setUp(self):
+        # A fake clock that time.sleep advances, so waits cost nothing
+        self.now = 0.0
+        self.sleeps = []
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+        for name, fake in (('monotonic', lambda: self.now), ('sleep', sleep)):
+            patcher = mock.patch.object(server.time, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def failing(self, retry_after=None, status=503):
+        """Return a callable that always fails with an HTTP error response"""
+        response = requests.Response()
+        response.status_code = status
+        if retry_after is not None:
+            response.headers['Retry-After'] = str(retry_after)
+
+        def call():
+            self.calls += 1
+            raise requests.exceptions.HTTPError(response=response)
+
+        self.calls = 0
+        return call
+
+    def test_returns_once_a_retry_succeeds(self):
+        results = iter([requests.exceptions.ConnectionError(), 'ok'])
+
+        def flaky():
+            result = next(results)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with self.assertLogs(server.logger, 'WARNING'):
+            self.assertEqual(server.call_with_backoff(flaky), 'ok')
+        self.assertEqual(len(self.sleeps), 1)
+
+    def test_does_not_retry_other_client_errors(self):
+        with self.assertRaises(requests.exceptions.HTTPError):
+            server.call_with_backoff(self.failing(status=404))
+        self.assertEqual(self.calls, 1)
+
+    def test_total_wait_stays_within_deadline(self):
+        with mock.patch.object(server, 'RETRY_DEADLINE', 10), self.assertLogs(server.logger, 'WARNING'):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                server.call_with_backoff(self.failing())
+        self.assertLessEqual(sum(self.sleeps), 10)
+        self.assertLess(self.calls, server.RETRY_ATTEMPTS)
+
+    def test_gives_up_instead_of_honoring_a_long_retry_after(self):
+        with mock.patch.object(server, 'RETRY_DEADLINE', 10), self.assertLogs(server.logger, 'WARNING'):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                server.call_with_backoff(self.failing(retry_after=30, status=429))
+        self.assertEqual(self.sleeps, [])
+        self.assertEqual(self.calls, 1)
+
+    def test_calls_in_one_budget_share_its_deadline(self):
+        with self.assertLogs(server.logger, 'WARNING'), server.retry_budget(10):
+            for _ in range(3):
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    server.call_with_backoff(self.failing())
+        self.assertLessEqual(sum(self.sleeps), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import contextlib
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+import server
+
+
+def trends_frame(values, dates=None, partial=False):
+    """Build an interest_over_time frame like pytrends returns, one column per keyword"""
+    dates = dates if dates is not None else pd.date_range('2024-01-01', periods=len(next(iter(values.values()))), freq='D')
+    frame = pd.DataFrame(values, index=pd.DatetimeIndex(dates, name='date'))
+    frame['isPartial'] = partial
+    return frame
+
+
+class FakeTrendReq:
+    """Stands in for a pooled TrendReq, answering each payload from a table of frames"""
+    def __init__(self, frames, payloads):
+        self.frames = frames
+        self.payloads = payloads
+
+    def build_payload(self, keywords, **kwargs):
+        self.keywords = tuple(keywords)
+        self.payloads.append(self.keywords)
+
+    def interest_over_time(self):
+        return self.frames[self.keywords]
+
+
+class FetchInterestOverTimeTest(unittest.TestCase):
+    def fetch(self, keywords, frames):
+        """Run fetch_interest_over_time against stubbed frames instead of Google"""
+        self.payloads = []
+
+        @contextlib.contextmanager
+        def checkout(hl, tz):
+            yield FakeTrendReq(frames, self.payloads)
+
+        with mock.patch.object(server, 'checkout_trendreq', checkout):
+            return server.fetch_interest_over_time(keywords, 'en-US', 360)
+
+    def test_short_list_is_one_payload(self):
+        frame = trends_frame({'a': [50, 100], 'b': [10, 20]})
+        result = self.fetch(['a', 'b'], {('a', 'b'): frame})
+        self.assertEqual(self.payloads, [('a', 'b')])
+        pd.testing.assert_frame_equal(result, frame)
+
+    def test_batches_share_the_first_keyword(self):
+        keywords = ['a', 'b', 'c', 'd', 'e', 'f', 'g']
+        frames = {
+            ('a', 'b', 'c', 'd', 'e'): trends_frame({'a': [50, 100], 'b': [10, 20], 'c': [0, 0], 'd': [5, 5], 'e': [1, 2]}),
+            ('a', 'f', 'g'): trends_frame({'a': [25, 50], 'f': [40, 50], 'g': [0, 10]}),
+        }
+        result = self.fetch(keywords, frames)
+        self.assertEqual(sorted(self.payloads), sorted(frames))
+        self.assertEqual(list(result.columns), keywords + ['isPartial'])
+        # The anchor sums to 150 in the first batch and 75 in the second, so the second batch doubles
+        self.assertEqual(result['f'].tolist(), [80, 100])
+        self.assertEqual(result['g'].tolist(), [0, 20])
+        self.assertEqual(result['a'].tolist(), [50, 100])
+        self.assertEqual(result['b'].tolist(), [10, 20])
+
+    def test_combined_peak_is_scaled_back_to_100(self):
+        frames = {
+            ('a', 'b', 'c', 'd', 'e'): trends_frame({'a': [50, 100], 'b': [0, 0], 'c': [0, 0], 'd': [0, 0], 'e': [0, 0]}),
+            ('a', 'f'): trends_frame({'a': [5, 10], 'f': [100, 50]}),
+        }
+        result = self.fetch(['a', 'b', 'c', 'd', 'e', 'f'], frames)
+        # f peaks ten times higher than a, so f becomes the 100 and a shrinks to match
+        self.assertEqual(result['f'].tolist(), [100, 50])
+        self.assertEqual(result['a'].tolist(), [5, 10])
+        self.assertLessEqual(result.drop(columns='isPartial').to_numpy().max(), 100)
+
+    def test_result_has_no_gaps_when_batches_cover_different_dates(self):
+        dates = pd.date_range('2024-01-01', periods=3, freq='D')
+        frames = {
+            ('a', 'b', 'c', 'd', 'e'): trends_frame({'a': [50, 100, 80], 'b': [1, 2, 3], 'c': [1, 1, 1], 'd': [2, 2, 2], 'e': [3, 3, 3]}, dates, partial=[False, False, True]),
+            ('a', 'f'): trends_frame({'a': [50, 100], 'f': [20, 40]}, dates[:2]),
+        }
+        result = self.fetch(['a', 'b', 'c', 'd', 'e', 'f'], frames)
+        self.assertEqual(list(result.index), list(dates[:2]))
+        self.assertFalse(result.isna().any().any())
+        for keyword in 'abcdef':
+            self.assertTrue(pd.api.types.is_integer_dtype(result[keyword]), keyword)
+        self.assertEqual(result['isPartial'].tolist(), [False, False])
+
+    def test_rejects_anchor_without_interest_in_a_later_batch(self):
+        frames = {
+            ('a', 'b', 'c', 'd', 'e'): trends_frame({'a': [50, 100], 'b': [1, 2], 'c': [1, 1], 'd': [2, 2], 'e': [3, 3]}),
+            ('a', 'f'): trends_frame({'a': [0, 0], 'f': [20, 40]}),
+        }
+        with self.assertRaisesRegex(server.ParamError, "'a' has no search interest alongside f"):
+            self.fetch(['a', 'b', 'c', 'd', 'e', 'f'], frames)
+
+    def test_rejects_anchor_without_interest_in_the_first_batch(self):
+        frames = {
+            ('a', 'b', 'c', 'd', 'e'): trends_frame({'a': [0, 0], 'b': [1, 2], 'c': [1, 1], 'd': [2, 2], 'e': [3, 3]}),
+            ('a', 'f'): trends_frame({'a': [10, 20], 'f': [20, 40]}),
+        }
+        with self.assertRaises(server.ParamError):
+            self.fetch(['a', 'b', 'c', 'd', 'e', 'f'], frames)
+
+    def test_rejects_empty_first_batch_instead_of_dropping_later_ones(self):
+        frames = {
+            ('a', 'b', 'c', 'd', 'e'): pd.DataFrame(),
+            ('a', 'f'): trends_frame({'a': [10, 20], 'f': [20, 40]}),
+        }
+        with self.assertRaises(server.ParamError):
+            self.fetch(['a', 'b', 'c', 'd', 'e', 'f'], frames)
+
+    def test_rejects_empty_later_batch(self):
+        frames = {
+            ('a', 'b', 'c', 'd', 'e'): trends_frame({'a': [50, 100], 'b': [1, 2], 'c': [1, 1], 'd': [2, 2], 'e': [3, 3]}),
+            ('a', 'f'): pd.DataFrame(),
+        }
+        with self.assertRaises(server.ParamError):
+            self.fetch(['a', 'b', 'c', 'd', 'e', 'f'], frames)
+
+
+if __name__ == '__main__':
+    unittest.main()
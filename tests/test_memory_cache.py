@@ -0,0 +1,85 @@
+import unittest
+from unittest import mock
+
+import server
+
+
+class MemoryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(server.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = server.MemoryCache(maxsize=3, ttl=60)
+
+    def test_get_returns_stored_value_until_ttl(self):
+        self.assertEqual(self.cache.put('k', b'value'), b'value')
+        self.now += 60
+        self.assertEqual(self.cache.get('k'), b'value')
+        self.now += 1
+        self.assertIsNone(self.cache.get('k'))
+
+    def test_missing_key(self):
+        self.assertIsNone(self.cache.get('k'))
+
+    def test_evicts_least_recently_used(self):
+        for key in 'abc':
+            self.cache.put(key, key.encode())
+        self.cache.get('a')
+        self.cache.put('d', b'd')
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), b'a')
+        self.assertEqual(self.cache.get('d'), b'd')
+
+    def test_keeps_larger_result_over_smaller_refetch(self):
+        self.cache.put('k', b'full', size=10)
+        with self.assertLogs(server.logger, 'WARNING'):
+            self.assertEqual(self.cache.put('k', b'empty', size=0), b'full')
+        self.assertEqual(self.cache.get('k'), b'full')
+
+    def test_kept_result_is_restamped_for_another_ttl(self):
+        self.cache.put('k', b'full', size=10)
+        self.now += 61
+        with self.assertLogs(server.logger, 'WARNING'):
+            self.cache.put('k', b'short', size=3)
+        self.now += 60
+        self.assertEqual(self.cache.get('k'), b'full')
+
+    def test_smaller_result_is_accepted_the_second_time(self):
+        self.cache.put('k', b'full', size=10)
+        with self.assertLogs(server.logger, 'WARNING'):
+            self.cache.put('k', b'short', size=3)
+        self.assertEqual(self.cache.put('k', b'short', size=3), b'short')
+        self.assertEqual(self.cache.get('k'), b'short')
+
+    def test_same_or_larger_result_replaces(self):
+        self.cache.put('k', b'first', size=5)
+        self.assertEqual(self.cache.put('k', b'shorter body', size=5), b'shorter body')
+        self.assertEqual(self.cache.put('k', b'x', size=6), b'x')
+
+    def test_compares_record_counts_not_body_length(self):
+        self.cache.put('k', b'{"data":[1000000,2000000]}', size=2)
+        self.assertEqual(self.cache.put('k', b'{"data":[1,2]}', size=2), b'{"data":[1,2]}')
+
+    def test_values_without_size_always_replace(self):
+        self.cache.put('k', b'a much longer body')
+        self.assertEqual(self.cache.put('k', b'short'), b'short')
+        self.cache.put('j', b'sized', size=10)
+        self.assertEqual(self.cache.put('j', b'unsized'), b'unsized')
+
+
+class RecordCountTest(unittest.TestCase):
+    def test_counts_records_in_lists(self):
+        self.assertEqual(server.record_count([{'a': 1}, {'a': 2}]), 2)
+
+    def test_sums_nested_lists(self):
+        data = {'kw': {'top': [1, 2, 3], 'rising': [4]}, 'other': {'top': [], 'rising': [5]}}
+        self.assertEqual(server.record_count(data), 5)
+
+    def test_scalars_count_nothing(self):
+        self.assertEqual(server.record_count({'message': 'Unsupported query type'}), 0)
+        self.assertEqual(server.record_count(None), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+import server
+
+
+class ParseQueryTest(unittest.TestCase):
+    def test_flat_dict(self):
+        self.assertEqual(server.parse_query('keywords=a,b&geo=US'), {'keywords': 'a,b', 'geo': 'US'})
+
+    def test_keeps_first_value_of_repeated_key(self):
+        self.assertEqual(server.parse_query('geo=US&geo=DE'), {'geo': 'US'})
+
+    def test_decodes_percent_escapes_and_plus(self):
+        self.assertEqual(server.parse_query('q=new+york&timeframe=today%203-m'), {'q': 'new york', 'timeframe': 'today 3-m'})
+
+    def test_drops_blank_values(self):
+        self.assertEqual(server.parse_query('geo=&hl=en-US'), {'hl': 'en-US'})
+
+    def test_empty_query_string(self):
+        self.assertEqual(server.parse_query(''), {})
+
+
+
+class KeywordsParamTest(unittest.TestCase):
+    def test_splits_and_strips(self):
+        self.assertEqual(server.keywords_param({'keywords': ' a , b,c '}), ['a', 'b', 'c'])
+
+    def test_drops_blank_and_repeated_terms_keeping_order(self):
+        self.assertEqual(server.keywords_param({'keywords': 'b,,a, ,b,a'}), ['b', 'a'])
+
+    def test_default_when_missing(self):
+        self.assertEqual(server.keywords_param({}), ['bitcoin'])
+        self.assertEqual(server.keywords_param({}, default='x,y'), ['x', 'y'])
+
+    def test_rejects_only_blank_terms(self):
+        with self.assertRaisesRegex(server.ParamError, 'at least one term'):
+            server.keywords_param({'keywords': ' , ,'})
+
+    def test_limit_counts_distinct_terms(self):
+        self.assertEqual(len(server.keywords_param({'keywords': 'a,b,c,d,e,a'})), server.MAX_TRENDS_KEYWORDS)
+        with self.assertRaisesRegex(server.ParamError, 'at most 5 terms'):
+            server.keywords_param({'keywords': 'a,b,c,d,e,f'})
+
+    def test_custom_limit(self):
+        keywords = ','.join(f'k{i}' for i in range(server.MAX_BATCHED_KEYWORDS))
+        self.assertEqual(len(server.keywords_param({'keywords': keywords}, limit=server.MAX_BATCHED_KEYWORDS)), server.MAX_BATCHED_KEYWORDS)
+        with self.assertRaises(server.ParamError):
+            server.keywords_param({'keywords': keywords + ',extra'}, limit=server.MAX_BATCHED_KEYWORDS)
+
+    def test_param_error_is_a_value_error(self):
+        with self.assertRaises(ValueError):
+            server.keywords_param({'keywords': ''})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import gzip
+import http.client
+import io
+import unittest
+
+import server
+
+
+class RecordingHandler(server.Handler):
+    """Handler that writes its response to memory instead of a socket"""
+    def __init__(self, headers=(), path='/trends/related-queries', request_version='HTTP/1.1'):
+        # BaseRequestHandler.__init__ would start serving a connection, so set up only what send_body reads
+        self.headers = http.client.HTTPMessage()
+        for name, value in headers:
+            self.headers[name] = value
+        self.request_path = path
+        self.request_version = request_version
+        self.requestline = f'GET {path} {request_version}'
+        self.command = 'GET'
+        self.client_address = ('127.0.0.1', 0)
+        self.close_connection = False
+        self.wfile = io.BytesIO()
+
+    def log_message(self, format, *args):
+        pass
+
+    def response(self):
+        """Parse what was written into (status, headers, body)"""
+        raw = io.BytesIO(self.wfile.getvalue())
+        status = int(raw.readline().split()[1])
+        headers = http.client.parse_headers(raw)
+        return status, headers, raw.read()
+
+
+def send(payload, status=200, **kwargs):
+    handler = RecordingHandler(**kwargs)
+    handler.send_body(status, payload)
+    return handler.response()
+
+
+class SendBodyTest(unittest.TestCase):
+    payload = b'{"data":[1,2,3]}'
+
+    def test_ok_response_carries_etag_and_length(self):
+        status, headers, body = send(self.payload)
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.payload)
+        self.assertEqual(headers['Content-Length'], str(len(self.payload)))
+        self.assertRegex(headers['ETag'], r'^"[0-9a-f]{16}"$')
+        self.assertEqual(headers['Cache-Control'], server.TRENDS_CACHE_CONTROL)
+
+    def test_etag_is_stable_for_the_same_body(self):
+        self.assertEqual(send(self.payload)[1]['ETag'], send(self.payload)[1]['ETag'])
+        self.assertNotEqual(send(self.payload)[1]['ETag'], send(b'{"data":[]}')[1]['ETag'])
+
+    def test_matching_if_none_match_gets_304_without_body(self):
+        etag = send(self.payload)[1]['ETag']
+        status, headers, body = send(self.payload, headers=[('If-None-Match', etag)])
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b'')
+        self.assertEqual(headers['ETag'], etag)
+        self.assertEqual(headers['Cache-Control'], server.TRENDS_CACHE_CONTROL)
+        self.assertIsNone(headers['Content-Length'])
+
+    def test_weak_and_listed_tags_match(self):
+        etag = send(self.payload)[1]['ETag']
+        for header in (f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(header=header):
+                self.assertEqual(send(self.payload, headers=[('If-None-Match', header)])[0], 304)
+
+    def test_stale_tag_gets_full_response(self):
+        status, _, body = send(self.payload, headers=[('If-None-Match', '"0000000000000000"')])
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.payload)
+
+    def test_errors_have_no_etag_and_are_not_cached(self):
+        status, headers, body = send(b'{"error":"x"}', status=400, headers=[('If-None-Match', '*')])
+        self.assertEqual(status, 400)
+        self.assertEqual(body, b'{"error":"x"}')
+        self.assertIsNone(headers['ETag'])
+        self.assertEqual(headers['Cache-Control'], 'no-store')
+
+    def test_gzip_representation_has_its_own_tag(self):
+        payload = b'{"data":[' + b','.join(b'%d' % i for i in range(1000)) + b']}'
+        plain = send(payload)[1]['ETag']
+        status, headers, body = send(payload, headers=[('Accept-Encoding', 'gzip')])
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(body), payload)
+        self.assertEqual(headers['ETag'], plain[:-1] + '-gzip"')
+        # The plain tag does not validate the gzipped representation
+        self.assertEqual(send(payload, headers=[('Accept-Encoding', 'gzip'), ('If-None-Match', plain)])[0], 200)
+        self.assertEqual(send(payload, headers=[('Accept-Encoding', 'gzip'), ('If-None-Match', headers['ETag'])])[0], 304)
+
+    def test_gzip_refused_with_zero_quality(self):
+        payload = b'x' * server.GZIP_MIN_SIZE
+        headers = send(payload, headers=[('Accept-Encoding', 'gzip;q=0')])[1]
+        self.assertIsNone(headers['Content-Encoding'])
+
+    def test_http09_gets_body_only(self):
+        handler = RecordingHandler(request_version='HTTP/0.9')
+        handler.send_body(200, self.payload)
+        self.assertEqual(handler.wfile.getvalue(), self.payload)
+
+
+if __name__ == '__main__':
+    unittest.main()
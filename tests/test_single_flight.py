@@ -0,0 +1,94 @@
+import threading
+import time
+import unittest
+
+import server
+
+
+class SingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.flight = server.SingleFlight()
+
+    def start_followers(self, count, key, fn):
+        """Start threads calling flight.do(key, fn) and collect what each one gets back"""
+        outcomes = []
+
+        def follow():
+            try:
+                outcomes.append(self.flight.do(key, fn))
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=follow) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, outcomes
+
+    def let_followers_arrive(self):
+        """Give follower threads time to reach the running call before the leader finishes"""
+        time.sleep(0.2)
+
+    def test_returns_result(self):
+        self.assertEqual(self.flight.do('k', lambda: 42), 42)
+        self.assertEqual(self.flight.calls, {})
+
+    def test_concurrent_callers_share_one_call(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return b'body'
+
+        leader, leader_outcome = self.start_followers(1, 'k', fetch)
+        started.wait(5)
+        followers, outcomes = self.start_followers(5, 'k', fetch)
+        self.let_followers_arrive()
+        release.set()
+        for thread in leader + followers:
+            thread.join(5)
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(leader_outcome + outcomes, [b'body'] * 6)
+        self.assertEqual(self.flight.calls, {})
+
+    def test_followers_get_the_leaders_exception(self):
+        started, release = threading.Event(), threading.Event()
+
+        def fetch():
+            started.set()
+            release.wait(5)
+            raise ValueError("upstream failed")
+
+        leader, leader_outcome = self.start_followers(1, 'k', fetch)
+        started.wait(5)
+        followers, outcomes = self.start_followers(3, 'k', fetch)
+        self.let_followers_arrive()
+        release.set()
+        for thread in leader + followers:
+            thread.join(5)
+
+        self.assertEqual(len(leader_outcome + outcomes), 4)
+        for outcome in leader_outcome + outcomes:
+            self.assertIsInstance(outcome, ValueError)
+        # A failed call is forgotten, so the next caller tries again
+        self.assertEqual(self.flight.do('k', lambda: 'retried'), 'retried')
+
+    def test_sequential_calls_each_run(self):
+        calls = []
+        for _ in range(3):
+            self.flight.do('k', lambda: calls.append(1))
+        self.assertEqual(len(calls), 3)
+
+    def test_different_keys_do_not_wait_on_each_other(self):
+        release = threading.Event()
+        leader, _ = self.start_followers(1, 'slow', lambda: release.wait(5))
+        self.assertEqual(self.flight.do('fast', lambda: 'done'), 'done')
+        release.set()
+        leader[0].join(5)
+
+
+if __name__ == '__main__':
+    unittest.main()